@@ -0,0 +1,117 @@
+"""Cold-start benchmark for the Lambda entry points
+
+Imports each entry module in a fresh interpreter with ``-X importtime`` and
+reports how long the import and the first-use construction of the bot take,
+plus the slowest modules in the import tree.
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --runs 10 --output cold_start_v1.2.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> expression that builds the bot the way the first invocation does
+ENTRY_POINTS = {
+    'lambda_function': 'lambda_function.get_runtime()',
+    'lambda_handler': 'lambda_handler.get_runtime()',
+}
+
+SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{construct}
+constructed = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'construct_ms': (constructed - imported) * 1000}}))
+"""
+
+def run_once(module, construct, workdir):
+    """Run one cold interpreter, returning timings and the -X importtime table"""
+    env = dict(os.environ)
+    env.setdefault('BOT_TOKEN', '123456:benchmark')
+    env.setdefault('OWNER_ID', '1')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SNIPPET.format(module=module, construct=construct)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        modules[name] = int(cumulative_us)
+    return timings, modules
+
+def benchmark(module, construct, runs, top):
+    """Median timings over several cold runs"""
+    imports, constructs, module_times = [], [], {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Warm the OS file cache and .pyc files once so every measured run is comparable
+        run_once(module, construct, workdir)
+        for _ in range(runs):
+            timings, modules = run_once(module, construct, workdir)
+            imports.append(timings['import_ms'])
+            constructs.append(timings['construct_ms'])
+            for name, cumulative_us in modules.items():
+                module_times.setdefault(name, []).append(cumulative_us)
+
+    slowest = sorted(
+        ((name, statistics.median(times) / 1000) for name, times in module_times.items() if '.' not in name),
+        key=lambda item: item[1], reverse=True
+    )[:top]
+    return {
+        'import_ms': round(statistics.median(imports), 2),
+        'construct_ms': round(statistics.median(constructs), 2),
+        'total_ms': round(statistics.median(i + c for i, c in zip(imports, constructs)), 2),
+        'slowest_top_level_imports_ms': {name: round(ms, 2) for name, ms in slowest}
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='cold runs per entry point (median is reported)')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest top-level imports to list')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'runs': args.runs,
+        'entry_points': {}
+    }
+    for module, construct in ENTRY_POINTS.items():
+        result = benchmark(module, construct, args.runs, args.top)
+        report['entry_points'][module] = result
+        print(f"{module}: import {result['import_ms']} ms + first use {result['construct_ms']} ms "
+              f"= {result['total_ms']} ms")
+        for name, ms in result['slowest_top_level_imports_ms'].items():
+            print(f"    {ms:9.2f} ms  {name}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Database startup benchmark
+
+Writes a snapshot with N users in the old plain JSON format, then times
+(each in a fresh interpreter) loading it the way versions before the index
+did, ``Database()`` migrating it into indexed shard files, and ``Database()``
+starting from those shards, plus the first ``get_user`` call after each load.
+
+    python benchmarks/db_startup.py
+    python benchmarks/db_startup.py --users 10000 100000 1000000 --output db_startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from user_memory import fake_users
+
+SNIPPET = """
+import json, time
+start = time.perf_counter()
+from database import Database
+db = Database()
+loaded = time.perf_counter()
+db.get_user({user_id})
+first = time.perf_counter()
+print(json.dumps({{'load_ms': (loaded - start) * 1000, 'first_get_user_ms': (first - loaded) * 1000}}))
+"""
+
+# The whole file parsed with json.load and every user decoded up front, as
+# the loader did before snapshots were indexed; nothing is written
+LEGACY_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from database import UserTable, open_snapshot
+data, _, _ = open_snapshot('bot_data.json')
+users = UserTable(data['users'])
+loaded = time.perf_counter()
+users.get({user_id})
+first = time.perf_counter()
+print(json.dumps({{'load_ms': (loaded - start) * 1000, 'first_get_user_ms': (first - loaded) * 1000}}))
+"""
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('BOT_TOKEN', '123456:benchmark')
+    env.setdefault('OWNER_ID', '1')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+def time_startup(workdir, user_id, snippet=SNIPPET):
+    """Load time and first lookup time in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', snippet.format(user_id=user_id)],
+        cwd=workdir, env=child_env(), capture_output=True, text=True, check=True
+    )
+    return {key: round(value, 2) for key, value in json.loads(result.stdout.strip().splitlines()[-1]).items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for count in args.users:
+        with tempfile.TemporaryDirectory() as workdir:
+            with open(os.path.join(workdir, 'bot_data.json'), 'w') as f:
+                json.dump({'users': fake_users(count), 'pending_links': [], 'approved_links': []}, f, indent=2)
+            user_id = 5000000000 + count // 2
+            plain = time_startup(workdir, user_id, LEGACY_SNIPPET)
+            # The first Database() moves the users into indexed shard files
+            migration = time_startup(workdir, user_id)
+            indexed = time_startup(workdir, user_id)
+
+        report[count] = {'plain_json': plain, 'migration': migration, 'indexed': indexed}
+        print(f"{count} users: plain JSON {plain['load_ms']} ms, one-time migration {migration['load_ms']} ms, "
+              f"indexed {indexed['load_ms']} ms (first get_user {indexed['first_get_user_ms']} ms)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
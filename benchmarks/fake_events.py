@@ -0,0 +1,105 @@
+"""Fake queue events for the batched Lambda handler
+
+Builds an SQS-style event whose ``Records`` carry Telegram updates from a
+handful of users, and either prints it or feeds it to
+``lambda_function.lambda_handler`` in-process.
+
+    python benchmarks/fake_events.py --updates 50 --users 5 > event.json
+    python benchmarks/fake_events.py --updates 50 --users 5 --invoke
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXTS = ['/start', '/help', 'hello', '/status']
+
+def make_update(update_id, user_id, text, message_id=1):
+    """A private-chat message update as Telegram sends it"""
+    message = {
+        'message_id': message_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private', 'first_name': f'User{user_id}'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'update_id': update_id, 'message': message}
+
+def make_callback_update(update_id, user_id, data, message_id=1, bot_id=1000):
+    """An inline button press on a message the bot sent to a private chat"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': f'User{user_id}'},
+                'from': {'id': bot_id, 'is_bot': True, 'first_name': 'Bot'},
+                'text': 'menu'
+            }
+        }
+    }
+
+def make_record(update):
+    """Wrap an update the way SQS delivers a message to Lambda"""
+    return {
+        'messageId': str(uuid.uuid4()),
+        'receiptHandle': uuid.uuid4().hex,
+        'body': json.dumps(update),
+        'attributes': {'ApproximateReceiveCount': '1', 'SentTimestamp': str(int(time.time() * 1000))},
+        'messageAttributes': {},
+        'eventSource': 'aws:sqs',
+        'awsRegion': 'us-east-1'
+    }
+
+def make_event(updates, users, first_update_id=1, duplicates=0, seed=None):
+    """An event with `updates` records spread over `users` users, plus `duplicates` redelivered ones"""
+    rng = random.Random(seed)
+    user_ids = [100000 + i for i in range(users)]
+    message_ids = {user_id: itertools.count(1) for user_id in user_ids}
+    batch = []
+    for update_id in range(first_update_id, first_update_id + updates):
+        user_id = rng.choice(user_ids)
+        batch.append(make_update(update_id, user_id, rng.choice(TEXTS), next(message_ids[user_id])))
+    batch += [rng.choice(batch) for _ in range(min(duplicates, len(batch)))]
+    return {'Records': [make_record(update) for update in batch]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=10, help='number of distinct updates')
+    parser.add_argument('--users', type=int, default=3, help='number of distinct users sending them')
+    parser.add_argument('--duplicates', type=int, default=0, help='extra records that repeat an earlier update')
+    parser.add_argument('--first-update-id', type=int, default=1)
+    parser.add_argument('--seed', type=int, help='random seed for a reproducible event')
+    parser.add_argument('--invoke', action='store_true', help='run the event through lambda_function.lambda_handler')
+    args = parser.parse_args()
+
+    event = make_event(args.updates, args.users, args.first_update_id, args.duplicates, args.seed)
+    if not args.invoke:
+        json.dump(event, sys.stdout, indent=2)
+        print()
+        return
+
+    sys.path.insert(0, ROOT)
+    import lambda_function
+    start = time.perf_counter()
+    result = lambda_function.lambda_handler(event, None)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(result, indent=2))
+    print(f"{len(event['Records'])} records in {elapsed * 1000:.1f} ms, "
+          f"{len(result['batchItemFailures'])} failed", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
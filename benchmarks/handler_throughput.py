@@ -0,0 +1,311 @@
+"""End-to-end handler throughput benchmark with a fake Bot API
+
+Pushes synthetic updates through ``Application.process_update`` of
+``ChannelBot`` (bot.py) or ``ChannelBotLambda`` (bot_lambda.py). Each user
+sends /start, opens the channel list, checks membership and requests a
+link, then the admin approves or rejects every request. Every Bot API call
+is answered in-process by a fake Telegram server after a configurable
+delay, so nothing leaves the machine. Reports per-handler p50/p95/p99
+latency, updates/sec and Bot API calls per update.
+
+    python benchmarks/handler_throughput.py
+    python benchmarks/handler_throughput.py --target lambda --users 500 --latency-ms 50 --output before.json
+"""
+import argparse
+import asyncio
+import collections
+import contextvars
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from cold_start import git_revision
+from fake_events import make_callback_update, make_update
+from post_updates import percentile
+
+BOT_USER = {'id': 1000, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+
+# Per-update counters, visible to the fake API and the log handler from
+# every task the update's handler starts
+current_update = contextvars.ContextVar('current_update', default=None)
+
+# label -> callback data or command for each step of a user's flow
+USER_FLOWS = {
+    'bot': [
+        ('start', '/start'),
+        ('show_channels', 'show_channels'),
+        ('check_membership', 'check_membership'),
+        ('request_link', '/request_link'),
+    ],
+    'lambda': [
+        ('start', '/start'),
+        ('show_channels', 'view_channels'),
+        ('check_membership', 'check_membership'),
+        ('request_link', 'request_link'),
+    ],
+}
+
+class FakeBotAPI:
+    """Answers Bot API requests in-process after latency (+ up to jitter) seconds"""
+
+    def __init__(self, latency, jitter, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = collections.Counter()
+        self.message_ids = itertools.count(1000)
+        self.invite_ids = itertools.count(1)
+
+    def install(self):
+        """Route every HTTPXRequest in this process to the fake"""
+        from telegram.request import HTTPXRequest
+        api = self
+
+        async def do_request(request, url, method, request_data=None, **kwargs):
+            return await api.do_request(url, request_data)
+        HTTPXRequest.do_request = do_request
+
+    async def do_request(self, url, request_data):
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        stats = current_update.get()
+        if stats is not None:
+            stats['api_calls'] += 1
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        result = self.result(endpoint, request_data.parameters if request_data else {})
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    def result(self, endpoint, params):
+        """A minimal valid result for a Bot API method"""
+        if endpoint == 'getMe':
+            return BOT_USER
+        if endpoint.startswith(('send', 'edit', 'copy', 'forward')):
+            if 'inline_message_id' in params:
+                return True
+            chat_id = int(params.get('chat_id', 0))
+            return {
+                'message_id': params.get('message_id') or next(self.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'channel'},
+                'from': BOT_USER,
+                'text': params.get('text', '')
+            }
+        if endpoint == 'getChat':
+            return {'id': int(params['chat_id']), 'type': 'channel', 'title': f"Channel {params['chat_id']}"}
+        if endpoint == 'getChatMember':
+            user_id = int(params['user_id'])
+            if user_id == BOT_USER['id']:
+                rights = ('can_be_edited', 'is_anonymous', 'can_manage_chat', 'can_delete_messages',
+                          'can_manage_video_chats', 'can_restrict_members', 'can_promote_members',
+                          'can_change_info', 'can_invite_users', 'can_post_messages')
+                return dict({'status': 'administrator', 'user': BOT_USER}, **{right: True for right in rights})
+            return {'status': 'member', 'user': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}}
+        if endpoint == 'createChatInviteLink':
+            return {
+                'invite_link': f'https://t.me/+benchmark{next(self.invite_ids)}',
+                'creator': BOT_USER,
+                'creates_join_request': False,
+                'is_primary': False,
+                'is_revoked': False,
+                'member_limit': params.get('member_limit')
+            }
+        return True
+
+class ErrorCounter(logging.Handler):
+    """Marks the update being processed as failed when anything logs an error for it"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record):
+        stats = current_update.get()
+        if stats is not None:
+            stats['errors'] += 1
+
+def build_update(update_id, user_id, step, message_id):
+    if step.startswith('/'):
+        return make_update(update_id, user_id, step, message_id)
+    return make_callback_update(update_id, user_id, step, message_id, BOT_USER['id'])
+
+async def process(application, label, payload, samples):
+    """Run one update through the application, recording its latency and API calls"""
+    from telegram import Update
+    update = Update.de_json(payload, application.bot)
+    stats = {'api_calls': 0, 'errors': 0}
+    token = current_update.set(stats)
+    start = time.perf_counter()
+    try:
+        await application.process_update(update)
+    except Exception:
+        stats['errors'] += 1
+    finally:
+        current_update.reset(token)
+    samples.append((label, (time.perf_counter() - start) * 1000, stats['api_calls'], stats['errors']))
+
+async def run_flows(application, flows, concurrency, samples):
+    """Run each flow's steps in order, up to `concurrency` flows at a time"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_flow(steps):
+        async with slots:
+            for label, payload in steps:
+                await process(application, label, payload, samples)
+    await asyncio.gather(*(run_flow(steps) for steps in flows))
+
+async def benchmark(channel_bot, args, samples):
+    """Drive every user flow, then the admin's decisions; returns elapsed seconds"""
+    import config
+    from database import db
+    application = channel_bot.application
+    update_ids = itertools.count(1)
+    admin_id = config.ADMIN_IDS[0]
+    channel = config.REQUIRED_CHANNELS[0] if config.REQUIRED_CHANNELS else 0
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        start = time.perf_counter()
+
+        user_flows = []
+        for i in range(args.users):
+            user_id = 100000 + i
+            user_flows.append([
+                (label, build_update(next(update_ids), user_id, step, message_id))
+                for message_id, (label, step) in enumerate(USER_FLOWS[args.target], 1)
+            ])
+        await run_flows(application, user_flows, args.concurrency, samples)
+
+        # Requests the bot did not record (e.g. an error above) are decided by id anyway
+        request_ids = [req['id'] for req in db.get_pending_links()] or list(range(1, args.users + 1))
+        admin_flows = []
+        for i, request_id in enumerate(request_ids):
+            if i % 2 == 0:
+                steps = [('approve', f'approve_{request_id}'), ('generate_link', f'genlink_{request_id}_{channel}')]
+            else:
+                steps = [('reject', f'reject_{request_id}')]
+            admin_flows.append([
+                (label, build_update(next(update_ids), admin_id, step, request_id))
+                for label, step in steps
+            ])
+        await run_flows(application, admin_flows, args.concurrency, samples)
+
+        elapsed = time.perf_counter() - start
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        # The working directory goes away after the run
+        await db.flush()
+    return elapsed
+
+def summarize(samples):
+    """Latency percentiles and API calls per handler"""
+    by_label = collections.defaultdict(list)
+    for sample in samples:
+        by_label[sample[0]].append(sample)
+    handlers = {}
+    for label, rows in by_label.items():
+        latencies = [row[1] for row in rows]
+        handlers[label] = {
+            'updates': len(rows),
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'api_calls_per_update': round(sum(row[2] for row in rows) / len(rows), 2),
+            'errors': sum(1 for row in rows if row[3])
+        }
+    return handlers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=sorted(USER_FLOWS), default='bot',
+                        help='bot: ChannelBot from bot.py, lambda: ChannelBotLambda from bot_lambda.py')
+    parser.add_argument('--users', type=int, default=200, help='users going through the whole flow')
+    parser.add_argument('--concurrency', type=int, default=50, help='users (and admin decisions) in flight at once')
+    parser.add_argument('--latency-ms', type=float, default=20, help='fake Bot API response time')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='extra random response time, up to this much')
+    parser.add_argument('--real-rate-limits', action='store_true',
+                        help="keep the outbound rate limits from config.py (they cap throughput at Telegram's limits)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own log output")
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    # A throwaway token and working directory: nothing reaches Telegram and
+    # the database, invite pool and membership index start empty
+    os.environ['BOT_TOKEN'] = '123456:benchmark'
+    os.environ.setdefault('OWNER_ID', '1')
+    sys.path.insert(0, ROOT)
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+
+    import config
+    if not args.real_rate_limits:
+        config.RATE_LIMIT_GLOBAL_PER_SECOND = 1000000
+        config.RATE_LIMIT_PRIVATE_CHAT_PER_SECOND = 1000000
+        config.RATE_LIMIT_PRIVATE_CHAT_BURST = 1000000
+        config.RATE_LIMIT_GROUP_CHAT_PER_MINUTE = 1000000
+
+    api = FakeBotAPI(args.latency_ms / 1000, args.jitter_ms / 1000, args.seed)
+    api.install()
+    if args.target == 'bot':
+        from bot import ChannelBot as bot_class
+    else:
+        from bot_lambda import ChannelBotLambda as bot_class
+
+    # Importing the bot sets up logging; replace it before the bot logs anything
+    root = logging.getLogger()
+    if not args.verbose:
+        root.handlers = []
+        root.setLevel(logging.WARNING)
+    root.addHandler(ErrorCounter())
+    channel_bot = bot_class()
+
+    samples = []
+    elapsed = asyncio.run(benchmark(channel_bot, args, samples))
+    api_calls = sum(row[2] for row in samples)
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'target': args.target,
+        'users': args.users,
+        'concurrency': args.concurrency,
+        'api_latency_ms': args.latency_ms,
+        'api_jitter_ms': args.jitter_ms,
+        'rate_limits': 'config' if args.real_rate_limits else 'off',
+        'updates': len(samples),
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(len(samples) / elapsed, 1),
+        'api_calls_per_update': round(api_calls / len(samples), 2),
+        'errors': sum(1 for row in samples if row[3]),
+        'api_calls_by_method': dict(api.calls.most_common()),
+        'handlers': summarize(samples)
+    }
+    workdir.cleanup()
+
+    print(f"{report['target']}: {report['updates']} updates in {report['seconds']} s = "
+          f"{report['updates_per_second']} updates/s, {report['api_calls_per_update']} API calls/update, "
+          f"{report['errors']} errors")
+    print(f"    {'handler':<18}{'updates':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls':>8}{'errors':>8}")
+    for label, result in report['handlers'].items():
+        print(f"    {label:<18}{result['updates']:>8}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['api_calls_per_update']:>8}{result['errors']:>8}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+
+if __name__ == '__main__':
+    main()
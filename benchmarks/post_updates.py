@@ -0,0 +1,88 @@
+"""Fake update poster for the self-hosted webhook server
+
+POSTs fake Telegram updates to a running ``RUN_MODE=webhook`` bot the way
+Telegram does, over several keep-alive connections, and reports how fast
+they were acknowledged.
+
+    RUN_MODE=webhook python bot.py
+    python benchmarks/post_updates.py --updates 2000 --connections 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_events import make_update
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def post_all(url, secret_token, updates, connections):
+    """Post updates over `connections` concurrent connections, returns (latencies, status counts)"""
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    headers = {'Content-Type': 'application/json'}
+    if secret_token:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret_token
+    latencies, statuses = [], {}
+
+    async def worker(client):
+        while not queue.empty():
+            update = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(url, content=json.dumps(update), headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(connections)))
+    return latencies, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:' + os.getenv('WEBHOOK_PORT', '8443')
+                        + os.getenv('WEBHOOK_PATH', '/webhook'))
+    parser.add_argument('--secret-token', default=os.getenv('WEBHOOK_SECRET_TOKEN'))
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--connections', type=int, default=40, help='Telegram uses up to max_connections (default 40)')
+    parser.add_argument('--first-update-id', type=int, default=int(time.time()))
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    updates = [
+        make_update(args.first_update_id + i, 100000 + i % args.users, 'hello', i // args.users + 1)
+        for i in range(args.updates)
+    ]
+    start = time.perf_counter()
+    latencies, statuses = asyncio.run(post_all(args.url, args.secret_token, updates, args.connections))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'updates': args.updates,
+        'connections': args.connections,
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(args.updates / elapsed, 1),
+        'ack_ms': {
+            'p50': round(statistics.median(latencies), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2)
+        },
+        'statuses': statuses
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Memory benchmark for the in-memory user table
+
+Builds N users both as the old dict-of-dicts keyed by string ids and as
+``database.UserTable``, and reports the bytes per user each layout takes
+(measured with tracemalloc).
+
+    python benchmarks/user_memory.py
+    python benchmarks/user_memory.py --users 1000000 --output user_memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def fake_users(count):
+    """Users in the snapshot shape, as add_user/grant_access would leave them"""
+    start = datetime(2024, 1, 1)
+    users = {}
+    for i in range(count):
+        joined = start + timedelta(seconds=i * 37)
+        users[str(5000000000 + i)] = {
+            'username': f'user_{i}',
+            'first_name': f'Name{i % 5000}',
+            'joined_at': joined.isoformat(),
+            'has_access': i % 3 == 0,
+            'last_check': (joined + timedelta(minutes=5)).isoformat() if i % 3 == 0 else None
+        }
+    return users
+
+def measure(build):
+    """Bytes allocated by build() that are still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('BOT_TOKEN', '123456:benchmark')
+    os.environ.setdefault('OWNER_ID', '1')
+    from database import UserTable
+
+    source = json.dumps(fake_users(args.users))
+    # Both layouts are built from the decoded snapshot, as load_data does
+    before, before_bytes = measure(lambda: json.loads(source))
+    del before
+    after, after_bytes = measure(lambda: UserTable(json.loads(source)))
+    del after
+
+    report = {
+        'users': args.users,
+        'dict_bytes_per_user': round(before_bytes / args.users, 1),
+        'user_table_bytes_per_user': round(after_bytes / args.users, 1),
+        'saving': f'{(1 - after_bytes / before_bytes) * 100:.0f}%'
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
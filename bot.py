@@ -1,11 +1,19 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ChatMemberHandler, MessageHandler, filters, ContextTypes
 from telegram.error import TelegramError
 import asyncio
+import signal
 
 from config import *
 from database import db
+from membership import get_missing_channels, membership_cache, membership_index
+from chat_info import chat_info_cache
+from invite_pool import invite_pool
+from notifications import AdminNotifier
+from rate_limiter import OutboundRateLimiter
+from update_processor import PerUserUpdateProcessor
+from webhook_reply import reply_text
 
 # Enable logging
 logging.basicConfig(
@@ -15,10 +23,59 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class ChannelBot:
-    def __init__(self):
-        self.application = Application.builder().token(BOT_TOKEN).build()
+    def __init__(self, serverless=False):
+        # On AWS Lambda (serverless) nothing runs between invocations, so
+        # there are no background jobs
+        self.serverless = serverless
+        self.application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .rate_limiter(OutboundRateLimiter())
+            .concurrent_updates(PerUserUpdateProcessor())
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        # Without the background flush every Lambda invocation flushes its own
+        # notification, so edit one live message rather than send one per request
+        self.admin_notifier = AdminNotifier(
+            live_message=ADMIN_DIGEST_LIVE_MESSAGE or serverless, pending_count=lambda: db.count_pending_links()
+        )
+        self.broadcaster = None
+        self.background_tasks = []
         self.setup_handlers()
     
+    async def post_init(self, application: Application):
+        """Warm the channel info cache and start background jobs"""
+        await chat_info_cache.warm(application.bot, REQUIRED_CHANNELS)
+        self.background_tasks = [
+            asyncio.create_task(chat_info_cache.refresh_forever(application.bot, REQUIRED_CHANNELS)),
+            asyncio.create_task(invite_pool.refill_forever(application.bot, REQUIRED_CHANNELS)),
+            asyncio.create_task(self.admin_notifier.flush_forever(application.bot))
+        ]
+        
+        # Pick up a broadcast interrupted by a crash or restart
+        if self.get_broadcaster().is_running():
+            logger.info("Resuming interrupted broadcast")
+            self.background_tasks.append(asyncio.create_task(self.broadcaster.run(application.bot)))
+    
+    def get_broadcaster(self):
+        """Create the broadcaster on first use; most deployments rarely broadcast"""
+        if self.broadcaster is None:
+            from broadcast import Broadcaster
+            self.broadcaster = Broadcaster(db)
+        return self.broadcaster
+    
+    async def post_shutdown(self, application: Application):
+        """Stop background jobs and send any queued admin notifications"""
+        for task in self.background_tasks:
+            task.cancel()
+        await self.admin_notifier.flush(application.bot)
+        try:
+            await db.flush()
+        except OSError as e:
+            logger.error(f"Error saving the database on shutdown: {e}")
+    
     def setup_handlers(self):
         """Setup bot command and callback handlers"""
         # Command handlers
@@ -27,6 +84,9 @@ class ChannelBot:
         self.application.add_handler(CommandHandler("status", self.status_command))
         self.application.add_handler(CommandHandler("admin", self.admin_command))
         self.application.add_handler(CommandHandler("pending", self.pending_command))
+        self.application.add_handler(CommandHandler("broadcast", self.broadcast_command))
+        self.application.add_handler(CommandHandler("broadcast_cancel", self.broadcast_cancel_command))
+        self.application.add_handler(CommandHandler("reshard", self.reshard_command))
         self.application.add_handler(CommandHandler("request_link", self.request_link_command))
         self.application.add_handler(CommandHandler("get_chat_id", self.get_chat_id_command))
         
@@ -35,6 +95,10 @@ class ChannelBot:
         
         # Message handlers
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        
+        # Channel membership changes
+        self.application.add_handler(ChatMemberHandler(self.track_channel_member, ChatMemberHandler.CHAT_MEMBER))
+        self.application.add_handler(ChatMemberHandler(self.track_bot_member, ChatMemberHandler.MY_CHAT_MEMBER))
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -45,7 +109,8 @@ class ChannelBot:
         
         # Check if user already has access
         if db.has_access(user.id):
-            await update.message.reply_text(
+            await reply_text(
+                update.message,
                 "✅ You already have access to the bot!\n\n"
                 "Available commands:\n"
                 "/help - Show help message\n"
@@ -58,12 +123,12 @@ class ChannelBot:
         keyboard = [[InlineKeyboardButton("📢 View Required Channels", callback_data="show_channels")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(WELCOME_MESSAGE, reply_markup=reply_markup)
+        await reply_text(update.message, WELCOME_MESSAGE, reply_markup=reply_markup)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
         if not db.has_access(update.effective_user.id):
-            await update.message.reply_text(MEMBERSHIP_REQUIRED_MESSAGE)
+            await reply_text(update.message, MEMBERSHIP_REQUIRED_MESSAGE)
             return
         
         help_text = """
@@ -77,7 +142,7 @@ class ChannelBot:
 📢 Channel Requirements:
 You must join all required channels to use this bot.
 """
-        await update.message.reply_text(help_text)
+        await reply_text(update.message, help_text)
     
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command"""
@@ -116,12 +181,116 @@ Joined: {user_data["joined_at"][:10]}
 
 /pending - View pending link requests
 /admin - Show this admin panel
+/broadcast <text> - Send a message to all users (or reply to a message with /broadcast to copy it)
+/broadcast_cancel - Stop the running broadcast
+/reshard <count> - Split users over a different number of database shards
 /get_chat_id - Get the chat ID of the current chat (use in channel/group)
 
 To approve/reject requests, use the buttons in /pending command.
 """
+        pool_stats = invite_pool.stats()
+        admin_text += "\n🔗 Invite link pool:\n"
+        for channel_id in REQUIRED_CHANNELS:
+            admin_text += f"• {channel_id}: {pool_stats['depth'].get(channel_id, 0)} ready\n"
+        admin_text += f"Refill rate: {pool_stats['refill_per_minute']}/min, empty takes: {pool_stats['empty_takes']}\n"
+        
+        processing = self.application.update_processor.stats()
+        admin_text += (
+            f"\n⚙️ Updates: {processing['active']}/{processing['workers']} workers busy, "
+            f"{processing['waiting']} waiting ({processing['users_waiting']} users), "
+            f"peak depth {processing['max_depth']}, {processing['processed']} processed\n"
+        )
         await update.message.reply_text(admin_text)
     
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /broadcast command - send a message to every user"""
+        user_id = update.effective_user.id
+        
+        if user_id not in ADMIN_IDS:
+            await update.message.reply_text("❌ You don't have admin privileges.")
+            return
+        
+        if self.serverless:
+            await update.message.reply_text(
+                "⚠️ /broadcast needs the bot running in polling or webhook server mode; "
+                "on Lambda nothing keeps sending once the invocation returns."
+            )
+            return
+        
+        broadcaster = self.get_broadcaster()
+        if broadcaster.is_running():
+            await update.message.reply_text("⚠️ A broadcast is already running. Use /broadcast_cancel to stop it.")
+            return
+        
+        replied = update.message.reply_to_message
+        parts = update.message.text.split(None, 1)
+        if not replied and len(parts) < 2:
+            await update.message.reply_text(
+                "Usage: /broadcast <text>\n"
+                "Or reply to any message with /broadcast to send a copy of it to all users."
+            )
+            return
+        
+        status_message = await update.message.reply_text("📣 Starting broadcast...")
+        if replied:
+            broadcaster.start(
+                status_message.chat_id, status_message.message_id,
+                from_chat_id=replied.chat_id, message_id=replied.message_id
+            )
+        else:
+            broadcaster.start(status_message.chat_id, status_message.message_id, text=parts[1])
+        
+        # Run in the background so the bot keeps answering other users
+        self.background_tasks.append(asyncio.create_task(broadcaster.run(context.bot)))
+    
+    async def broadcast_cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /broadcast_cancel command"""
+        if update.effective_user.id not in ADMIN_IDS:
+            await update.message.reply_text("❌ You don't have admin privileges.")
+            return
+        
+        if not self.get_broadcaster().is_running():
+            await update.message.reply_text("✅ No broadcast is running.")
+            return
+        
+        self.broadcaster.cancel()
+        await update.message.reply_text("🛑 Broadcast will stop after the current batch.")
+    
+    async def reshard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /reshard command - move users into a different number of shards"""
+        if update.effective_user.id not in ADMIN_IDS:
+            await update.message.reply_text("❌ You don't have admin privileges.")
+            return
+        
+        if DATABASE_BACKEND != 'json':
+            await update.message.reply_text("❌ Resharding only applies to the JSON database.")
+            return
+        
+        if len(context.args) != 1 or not context.args[0].isdigit() or not 1 <= int(context.args[0]) <= DATABASE_MAX_SHARDS:
+            await update.message.reply_text(
+                f"Usage: /reshard <count>, count from 1 to {DATABASE_MAX_SHARDS}\n"
+                f"Users are in {len(db.shards)} shards now."
+            )
+            return
+        
+        if db.resharding:
+            await update.message.reply_text("⚠️ A reshard is already running.")
+            return
+        
+        count = int(context.args[0])
+        status_message = await update.message.reply_text(f"🔀 Moving {db.count_users()} users into {count} shards...")
+        try:
+            changed = await db.reshard(count)
+        except Exception as e:
+            logger.error(f"Error resharding to {count}: {e}")
+            await status_message.edit_text(f"❌ Resharding failed: {e}")
+            return
+        
+        if changed:
+            await status_message.edit_text(f"✅ Users are now in {count} shards.")
+        else:
+            await status_message.edit_text(f"✅ Users are already in {count} shards.")
+    
     async def pending_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /pending command - show pending link requests"""
         user_id = update.effective_user.id
@@ -130,30 +299,66 @@ To approve/reject requests, use the buttons in /pending command.
             await update.message.reply_text("❌ You don't have admin privileges.")
             return
         
-        pending_requests = db.get_pending_links()
+        text, reply_markup = self.build_pending_page()
+        await update.message.reply_text(text, reply_markup=reply_markup)
+    
+    def build_pending_page(self, after_id=None, before_id=None):
+        """Build the text and keyboard for one page of pending link requests"""
+        requests, has_prev, has_next = db.get_pending_links_page(after_id, before_id, PENDING_PAGE_SIZE)
         
-        if not pending_requests:
-            await update.message.reply_text("✅ No pending link requests.")
-            return
+        if not requests:
+            if after_id is not None or before_id is not None:
+                # The page emptied out while browsing, start over
+                return self.build_pending_page()
+            return "✅ No pending link requests.", None
         
-        for request in pending_requests:
-            request_text = f"""
-📋 Link Request #{request["id"]}
-👤 User: @{request["username"]} (ID: {request["user_id"]})
-📝 Type: {request["link_type"]}
-💬 Description: {request["description"]}
-📅 Requested: {request["requested_at"][:16]}
+        text = f"📋 Pending link requests ({db.count_pending_links()} total)\n"
+        keyboard = []
+        for request in requests:
+            text += f"""
+#{request["id"]} • @{request["username"]} (ID: {request["user_id"]})
+📝 {request["link_type"]} • 📅 {request["requested_at"][:16]}
+💬 {request["description"]}
 """
-            
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ Approve", callback_data=f"approve_{request['id']}"),
-                    InlineKeyboardButton("❌ Reject", callback_data=f"reject_{request['id']}")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(request_text, reply_markup=reply_markup)
+            keyboard.append([
+                InlineKeyboardButton(f"✅ Approve #{request['id']}", callback_data=f"approve_{request['id']}"),
+                InlineKeyboardButton(f"❌ Reject #{request['id']}", callback_data=f"reject_{request['id']}")
+            ])
+        
+        navigation = []
+        if has_prev:
+            navigation.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"pending_prev_{requests[0]['id']}"))
+        if has_next:
+            navigation.append(InlineKeyboardButton("Next ➡️", callback_data=f"pending_next_{requests[-1]['id']}"))
+        if navigation:
+            keyboard.append(navigation)
+        
+        return text, InlineKeyboardMarkup(keyboard)
+    
+    async def show_pending_page(self, query, direction, cursor):
+        """Edit the /pending message to show the previous or next page"""
+        if query.from_user.id not in ADMIN_IDS:
+            await query.answer("❌ Not authorized", show_alert=True)
+            return
+        
+        if direction == "next":
+            text, reply_markup = self.build_pending_page(after_id=cursor)
+        else:
+            text, reply_markup = self.build_pending_page(before_id=cursor)
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    
+    async def refresh_pending_page(self, query, notice=""):
+        """Re-render the /pending page a button was pressed on, starting from the same request"""
+        page_ids = [
+            int(button.callback_data.split("_")[1])
+            for row in query.message.reply_markup.inline_keyboard for button in row
+            if button.callback_data and button.callback_data.startswith("approve_")
+        ] if query.message.reply_markup else []
+        if page_ids:
+            text, reply_markup = self.build_pending_page(after_id=min(page_ids) - 1)
+        else:
+            text, reply_markup = self.build_pending_page()
+        await query.edit_message_text(notice + text, reply_markup=reply_markup)
     
     async def request_link_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /request_link command"""
@@ -170,22 +375,20 @@ To approve/reject requests, use the buttons in /pending command.
             link_type="Private Channel Access",
             description="User requested private channel access"
         )
+        try:
+            await db.flush()
+        except OSError as e:
+            logger.error(f"Could not save link request #{request_id}: {e}")
+            await update.message.reply_text("❌ Your link request could not be saved right now. Please try again later.")
+            return
         
         await update.message.reply_text(
             f"✅ Your link request has been submitted (Request #{request_id}).\n"
             "An admin will review it shortly."
         )
         
-        # Notify admins
-        for admin_id in ADMIN_IDS:
-            try:
-                await context.bot.send_message(
-                    admin_id,
-                    f"🔔 New link request #{request_id} from @{update.effective_user.username}\n"
-                    "Use /pending to review."
-                )
-            except:
-                pass
+        # Notify admins (batched into digests during bursts)
+        await self.admin_notifier.notify(context.bot, request_id, user_id, update.effective_user.username)
     
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks"""
@@ -207,6 +410,9 @@ To approve/reject requests, use the buttons in /pending command.
             await self.reject_request(query, context, request_id)
         elif data.startswith("genlink_"):
             await self.generate_invite_link(query, context)
+        elif data.startswith("pending_"):
+            _, direction, cursor = data.split("_")
+            await self.show_pending_page(query, direction, int(cursor))
     
     async def show_channels(self, query):
         """Show required channels to user"""
@@ -234,22 +440,11 @@ To approve/reject requests, use the buttons in /pending command.
             await query.edit_message_text(ACCESS_GRANTED_MESSAGE)
             return
         
-        # Check membership in each channel
-        all_joined = True
-        not_joined = []
-        
-        for channel_id in REQUIRED_CHANNELS:
-            try:
-                member = await context.bot.get_chat_member(channel_id, user_id)
-                if member.status in ["left", "kicked"]:
-                    all_joined = False
-                    not_joined.append(channel_id)
-            except TelegramError as e:
-                logger.warning(f"Could not check membership for {channel_id}: {e}")
-                # If bot can't check (e.g., not admin in channel, or invalid link),
-                # assume user hasn't joined for safety.
-                all_joined = False
-                not_joined.append(channel_id)
+        # Answer from the local index where possible, querying the rest at once
+        not_joined = await get_missing_channels(
+            context.bot, user_id, REQUIRED_CHANNELS, cache=membership_cache, index=membership_index
+        )
+        all_joined = not not_joined
         
         if all_joined:
             db.grant_access(user_id)
@@ -262,39 +457,63 @@ To approve/reject requests, use the buttons in /pending command.
                 f"Then click the button again to verify."
             )
     
+    async def track_channel_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Keep the membership index in sync with joins and leaves in required channels"""
+        chat_member = update.chat_member
+        channel_id = chat_member.chat.id
+        if channel_id not in REQUIRED_CHANNELS:
+            return
+        
+        member = chat_member.new_chat_member
+        user_id = member.user.id
+        joined = member.status not in ["left", "kicked"]
+        if member.status == "restricted":
+            joined = member.is_member
+        
+        membership_index.set(user_id, channel_id, joined)
+        membership_cache.invalidate(user_id, channel_id)
+        
+        if not joined and db.has_access(user_id):
+            logger.info(f"User {user_id} left {channel_id}, revoking access")
+            db.revoke_access(user_id)
+    
+    async def track_bot_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Update cached channel info when the bot's own rights in a channel change"""
+        chat_member = update.my_chat_member
+        if chat_member.chat.id in REQUIRED_CHANNELS:
+            chat_info_cache.update_from_member(chat_member.chat, chat_member.new_chat_member)
+    
     async def approve_request(self, query, context, request_id):
         """Handle approve button callback - ask admin to select channel for link generation"""
         if query.from_user.id not in ADMIN_IDS:
             await query.answer("❌ Not authorized", show_alert=True)
             return
         
-        pending_request = None
-        for req in db.get_pending_links():
-            if req["id"] == request_id:
-                pending_request = req
-                break
+        pending_request = db.get_pending_link(request_id)
         
         if not pending_request:
             await query.answer("❌ Request not found or already processed", show_alert=True)
             return
         
+        # Channel titles come from the cache; only channels never fetched hit the API
+        unknown = [channel_id for channel_id in REQUIRED_CHANNELS if chat_info_cache.get(channel_id) is None]
+        if unknown:
+            await chat_info_cache.warm(context.bot, unknown)
+        
         keyboard = []
         for channel_id in REQUIRED_CHANNELS:
-            try:
-                chat = await context.bot.get_chat(channel_id)
-                keyboard.append([InlineKeyboardButton(chat.title, callback_data=f"genlink_{request_id}_{channel_id}")])
-            except TelegramError as e:
-                logger.warning(f"Could not get chat info for {channel_id}: {e}")
-                # If we can't get chat info, we can't create a button for it.
-                # You might want to add a fallback or inform the admin.
-                pass
+            info = chat_info_cache.get(channel_id)
+            # If we can't get chat info, we can't create a button for it.
+            if info["ok"]:
+                keyboard.append([InlineKeyboardButton(info["title"], callback_data=f"genlink_{request_id}_{channel_id}")])
 
+        # Reply with a new message so the /pending page stays where the admin is browsing
         if not keyboard:
-            await query.edit_message_text("❌ No valid channels found to generate invite links for. Please ensure the bot is an admin in the channels and the links are correct.")
+            await query.message.reply_text("❌ No valid channels found to generate invite links for. Please ensure the bot is an admin in the channels and the links are correct.")
             return
 
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(
+        await query.message.reply_text(
             f"✅ Request #{request_id} approved. Please select the channel to generate the invite link for:",
             reply_markup=reply_markup
         )
@@ -310,26 +529,38 @@ To approve/reject requests, use the buttons in /pending command.
         channel_id = int(data_parts[2]) # channel_id should be an integer
 
         # Find the pending request
-        pending_request = None
-        for req in db.get_pending_links():
-            if req["id"] == request_id:
-                pending_request = req
-                break
+        pending_request = db.get_pending_link(request_id)
 
         if not pending_request:
             await query.answer("❌ Request not found or already processed", show_alert=True)
             return
 
+        private_link = None
+        approved = False
         try:
-            # Generate a new invite link
-            invite_link_object = await context.bot.create_chat_invite_link(
-                chat_id=channel_id,
-                member_limit=1,  # Limit to one use per link
-                expire_date=None # No expiration
-            )
-            private_link = invite_link_object.invite_link
+            # Use a pre-created link, falling back to creating one if the pool is empty
+            private_link = invite_pool.take(channel_id)
+            if private_link is None:
+                invite_link_object = await context.bot.create_chat_invite_link(
+                    chat_id=channel_id,
+                    member_limit=1,  # Limit to one use per link
+                    expire_date=None # No expiration
+                )
+                private_link = invite_link_object.invite_link
 
-            if db.approve_link(request_id, query.from_user.id, private_link):
+            approved = db.approve_link(request_id, query.from_user.id, private_link)
+            if approved:
+                # Make sure the approval is on disk before the link goes out
+                try:
+                    await db.flush()
+                except OSError as e:
+                    logger.error(f"Could not save approval of request #{request_id}: {e}")
+                    await query.edit_message_text(
+                        f"⚠️ Request #{request_id} was approved, but the approval could not be saved, "
+                        f"so the link was not sent to the user.\n"
+                        f"Send it by hand once the bot's storage is fixed: {private_link}"
+                    )
+                    return
                 await query.edit_message_text(
                     f"✅ Request #{request_id} has been approved.\n"
                     f"Private link for {channel_id}: {private_link}"
@@ -350,6 +581,11 @@ To approve/reject requests, use the buttons in /pending command.
         except TelegramError as e:
             await query.edit_message_text(f"❌ Error generating link for {channel_id}: {e}")
             logger.error(f"Error creating invite link for {channel_id}: {e}")
+        finally:
+            if private_link is not None and not approved:
+                # Another admin got there first, or the approval failed: the
+                # single-use link was never handed out, keep it for the next one
+                invite_pool.put_back(channel_id, private_link)
 
     async def get_chat_id_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /get_chat_id command to get chat ID"""
@@ -365,30 +601,30 @@ To approve/reject requests, use the buttons in /pending command.
             return
         
         if db.reject_link(request_id, query.from_user.id, "Rejected by admin"):
-            await query.edit_message_text(f"❌ Request #{request_id} has been rejected.")
+            await self.refresh_pending_page(query, f"❌ Request #{request_id} has been rejected.\n\n")
             
             # Notify the user
-            for req in db.data["pending_links"]:
-                if req["id"] == request_id:
-                    try:
-                        await context.bot.send_message(
-                            req["user_id"],
-                            f"❌ Your link request #{request_id} has been rejected."
-                        )
-                    except:
-                        pass
-                    break
+            req = db.get_link_request(request_id)
+            if req:
+                try:
+                    await context.bot.send_message(
+                        req["user_id"],
+                        f"❌ Your link request #{request_id} has been rejected."
+                    )
+                except TelegramError as e:
+                    logger.error(f"Could not notify user {req['user_id']}: {e}")
         else:
             await query.answer("❌ Request not found or already processed", show_alert=True)
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular text messages"""
         if not db.has_access(update.effective_user.id):
-            await update.message.reply_text(MEMBERSHIP_REQUIRED_MESSAGE)
+            await reply_text(update.message, MEMBERSHIP_REQUIRED_MESSAGE)
             return
         
         # Handle other messages from verified users
-        await update.message.reply_text(
+        await reply_text(
+            update.message,
             "👋 Hello! Use /help to see available commands."
         )
     
@@ -399,7 +635,42 @@ To approve/reject requests, use the buttons in /pending command.
         print(f"Owner ID: {OWNER_ID}")
         print(f"Required channels: {len(REQUIRED_CHANNELS)}")
         
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if RUN_MODE == 'webhook':
+            asyncio.run(self.run_webhook())
+        else:
+            self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+    
+    async def run_webhook(self):
+        """Receive updates through the built-in webhook server until SIGINT/SIGTERM"""
+        from webhook_server import WebhookServer
+        if not WEBHOOK_SECRET_TOKEN:
+            print("❌ WEBHOOK_SECRET_TOKEN must be set in webhook mode, refusing to start")
+            return
+        server = WebhookServer(self.application)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        
+        async with self.application:
+            await self.post_init(self.application)
+            await self.application.start()
+            await server.start()
+            if WEBHOOK_URL:
+                await self.application.bot.set_webhook(
+                    url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                    secret_token=WEBHOOK_SECRET_TOKEN,
+                    allowed_updates=Update.ALL_TYPES,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS
+                )
+                print(f"Webhook set to {WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH}")
+            
+            try:
+                await stop.wait()
+            finally:
+                await server.stop()
+                await self.application.stop()
+                await self.post_shutdown(self.application)
 
 if __name__ == "__main__":
     bot = ChannelBot()
@@ -2,10 +2,12 @@ import logging
 import json
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-from telegram.error import TelegramError
 
 from config import *
 from database import db
+from membership import get_missing_channels, membership_cache
+from notifications import AdminNotifier
+from webhook_reply import reply_text
 
 # Enable logging
 logging.basicConfig(
@@ -18,6 +20,11 @@ class ChannelBotLambda:
     def __init__(self):
         """Initialize the bot for Lambda deployment"""
         self.application = None
+        # No background flush in Lambda: the entry points flush queued events
+        # before each invocation returns. With one update per invocation that
+        # would be a message per request, so each admin gets one live "N pending"
+        # message edited in place instead (one per warm container).
+        self.admin_notifier = AdminNotifier(live_message=True, pending_count=lambda: db.count_pending_links())
         self.setup_application()
     
     def setup_application(self):
@@ -77,14 +84,14 @@ Click the button below to see the channels you need to join.
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
+        await reply_text(update.message, welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def view_channels(self, update: Update, context):
         """Show required channels"""
         channels_text = "📺 **Required Channels to Join:**\n\n"
         
-        for i, (name, link) in enumerate(REQUIRED_CHANNELS.items(), 1):
-            channels_text += f"{i}. [{name}]({link})\n"
+        for i, channel in enumerate(REQUIRED_CHANNELS, 1):
+            channels_text += f"{i}. `{channel}`\n"
         
         channels_text += "\n✅ **After joining all channels, click the button below:**"
         
@@ -103,17 +110,8 @@ Click the button below to see the channels you need to join.
         
         await query.answer("Checking your membership...")
         
-        # Check membership in all channels
-        not_joined = []
-        
-        for channel_name, chat_id in CHAT_IDS.items():
-            try:
-                member = await context.bot.get_chat_member(chat_id, user_id)
-                if member.status in ['left', 'kicked']:
-                    not_joined.append(channel_name)
-            except TelegramError as e:
-                logger.error(f"Error checking membership for {channel_name}: {e}")
-                not_joined.append(channel_name)
+        # Check membership in all channels, skipping cached verdicts
+        not_joined = await get_missing_channels(context.bot, user_id, REQUIRED_CHANNELS, cache=membership_cache)
         
         if not_joined:
             # User hasn't joined all channels
@@ -121,8 +119,7 @@ Click the button below to see the channels you need to join.
             not_joined_text += "**Please join these channels:**\n"
             
             for channel in not_joined:
-                if channel in REQUIRED_CHANNELS:
-                    not_joined_text += f"• [{channel}]({REQUIRED_CHANNELS[channel]})\n"
+                not_joined_text += f"• `{channel}`\n"
             
             not_joined_text += "\n**After joining, click the button again.**"
             
@@ -157,7 +154,12 @@ Now you can request access to our private content.
         username = query.from_user.username or "Unknown"
         
         # Add request to database
-        db.add_link_request(user_id, username)
+        request_id = db.add_pending_link(
+            user_id=user_id,
+            username=username,
+            link_type="Private Channel Access",
+            description="User requested private channel access"
+        )
         
         await query.answer("Request submitted!")
         
@@ -179,24 +181,11 @@ Thank you for your patience! 🙏
         await query.edit_message_text(request_text, reply_markup=reply_markup, parse_mode='Markdown')
         
         # Notify admins
-        await self.notify_admins_new_request(context, user_id, username)
+        await self.notify_admins_new_request(context, user_id, username, request_id)
     
-    async def notify_admins_new_request(self, context, user_id, username):
+    async def notify_admins_new_request(self, context, user_id, username, request_id=None):
         """Notify admins about new link request"""
-        notification_text = f"""
-🔔 **New Link Request**
-
-User: @{username} (ID: {user_id})
-Time: {db.get_current_time()}
-
-Use /pending to review all pending requests.
-        """
-        
-        for admin_id in ADMIN_IDS:
-            try:
-                await context.bot.send_message(admin_id, notification_text, parse_mode='Markdown')
-            except Exception as e:
-                logger.error(f"Failed to notify admin {admin_id}: {e}")
+        await self.admin_notifier.notify(context.bot, request_id, user_id, username)
     
     async def admin_command(self, update: Update, context):
         """Handle /admin command"""
@@ -228,26 +217,24 @@ Welcome to the admin panel. Here you can manage link requests and bot settings.
             await update.message.reply_text("❌ You are not authorized to use this command.")
             return
         
-        pending_requests = db.get_pending_requests()
+        pending_requests = db.get_pending_links()
         
         if not pending_requests:
             await update.message.reply_text("✅ No pending link requests.")
             return
         
         for request in pending_requests:
-            request_id, user_id, username, request_time = request
-            
             request_text = f"""
-📝 **Link Request #{request_id}**
+📝 **Link Request #{request['id']}**
 
-User: @{username} (ID: {user_id})
-Requested: {request_time}
+User: @{request['username']} (ID: {request['user_id']})
+Requested: {request['requested_at'][:19]}
             """
             
             keyboard = [
                 [
-                    InlineKeyboardButton("✅ Approve", callback_data=f"approve_{request_id}"),
-                    InlineKeyboardButton("❌ Reject", callback_data=f"reject_{request_id}")
+                    InlineKeyboardButton("✅ Approve", callback_data=f"approve_{request['id']}"),
+                    InlineKeyboardButton("❌ Reject", callback_data=f"reject_{request['id']}")
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -295,8 +282,8 @@ Chat Type: {chat_type}
             elif data.startswith("genlink_"):
                 parts = data.split("_")
                 request_id = int(parts[1])
-                channel_name = parts[2]
-                await self.generate_invite_link(update, context, request_id, channel_name)
+                chat_id = int(parts[2])
+                await self.generate_invite_link(update, context, request_id, chat_id)
         except Exception as e:
             logger.error(f"Error in button callback: {e}")
             await query.answer("An error occurred. Please try again.")
@@ -327,7 +314,7 @@ Click the button below to see the channels you need to join.
         """Show pending requests in admin panel"""
         query = update.callback_query
         
-        pending_requests = db.get_pending_requests()
+        pending_requests = db.get_pending_links()
         
         if not pending_requests:
             await query.edit_message_text("✅ No pending link requests.")
@@ -336,8 +323,7 @@ Click the button below to see the channels you need to join.
         requests_text = "📋 **Pending Link Requests:**\n\n"
         
         for request in pending_requests[:5]:  # Show first 5 requests
-            request_id, user_id, username, request_time = request
-            requests_text += f"#{request_id}: @{username} ({request_time})\n"
+            requests_text += f"#{request['id']}: @{request['username']} ({request['requested_at'][:19]})\n"
         
         if len(pending_requests) > 5:
             requests_text += f"\n... and {len(pending_requests) - 5} more requests."
@@ -355,8 +341,8 @@ Click the button below to see the channels you need to join.
         """Show bot statistics"""
         query = update.callback_query
         
-        total_users = db.get_total_users()
-        pending_requests = len(db.get_pending_requests())
+        total_users = db.count_users()
+        pending_requests = db.count_pending_links()
         
         stats_text = f"""
 📊 **Bot Statistics**
@@ -377,23 +363,25 @@ Click the button below to see the channels you need to join.
         """Approve a link request"""
         query = update.callback_query
         
+        if query.from_user.id not in ADMIN_IDS:
+            await query.answer("❌ Not authorized", show_alert=True)
+            return
+        
         # Get request details
-        request = db.get_request_by_id(request_id)
+        request = db.get_pending_link(request_id)
         if not request:
             await query.answer("Request not found.")
             return
         
-        user_id, username = request[1], request[2]
-        
         # Show channel selection for link generation
         channels_text = "🔗 **Select Channel for Private Link:**\n\n"
         channels_text += "Choose which channel to generate a private invite link for:"
         
         keyboard = []
-        for channel_name in CHAT_IDS.keys():
+        for channel in REQUIRED_CHANNELS:
             keyboard.append([InlineKeyboardButton(
-                f"🔗 {channel_name}", 
-                callback_data=f"genlink_{request_id}_{channel_name}"
+                f"🔗 {channel}", 
+                callback_data=f"genlink_{request_id}_{channel}"
             )])
         
         keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="admin_pending")])
@@ -401,22 +389,24 @@ Click the button below to see the channels you need to join.
         
         await query.edit_message_text(channels_text, reply_markup=reply_markup, parse_mode='Markdown')
     
-    async def generate_invite_link(self, update: Update, context, request_id, channel_name):
+    async def generate_invite_link(self, update: Update, context, request_id, chat_id):
         """Generate invite link for approved request"""
         query = update.callback_query
         
+        if query.from_user.id not in ADMIN_IDS:
+            await query.answer("❌ Not authorized", show_alert=True)
+            return
+        
         try:
             # Get request details
-            request = db.get_request_by_id(request_id)
+            request = db.get_pending_link(request_id)
             if not request:
                 await query.answer("Request not found.")
                 return
             
-            user_id, username = request[1], request[2]
+            user_id, username = request['user_id'], request['username']
             
-            # Get chat ID for the channel
-            chat_id = CHAT_IDS.get(channel_name)
-            if not chat_id:
+            if chat_id not in REQUIRED_CHANNELS:
                 await query.answer("Channel not found.")
                 return
             
@@ -428,13 +418,15 @@ Click the button below to see the channels you need to join.
             )
             
             # Mark request as approved
-            db.approve_request(request_id)
+            if not db.approve_link(request_id, query.from_user.id, invite_link.invite_link):
+                await query.answer("Request not found.")
+                return
             
             # Send link to user
             link_message = f"""
 🎉 **Your Private Link Request Approved!**
 
-Here's your exclusive invite link for **{channel_name}**:
+Here's your exclusive invite link for **{chat_id}**:
 
 {invite_link.invite_link}
 
@@ -452,7 +444,7 @@ Enjoy the exclusive content! 🎬
                 # Confirm to admin
                 await query.edit_message_text(
                     f"✅ **Request Approved!**\n\n"
-                    f"Private link for **{channel_name}** sent to @{username}.",
+                    f"Private link for **{chat_id}** sent to @{username}.",
                     parse_mode='Markdown'
                 )
                 
@@ -473,16 +465,20 @@ Enjoy the exclusive content! 🎬
         """Reject a link request"""
         query = update.callback_query
         
+        if query.from_user.id not in ADMIN_IDS:
+            await query.answer("❌ Not authorized", show_alert=True)
+            return
+        
         # Get request details
-        request = db.get_request_by_id(request_id)
+        request = db.get_pending_link(request_id)
         if not request:
             await query.answer("Request not found.")
             return
         
-        user_id, username = request[1], request[2]
+        user_id, username = request['user_id'], request['username']
         
         # Mark request as rejected
-        db.reject_request(request_id)
+        db.reject_link(request_id, query.from_user.id)
         
         # Notify user
         rejection_message = """
@@ -507,10 +503,18 @@ You can try requesting again later or contact support if you believe this was an
     
     async def unknown_message(self, update: Update, context):
         """Handle unknown messages"""
-        await update.message.reply_text(
+        await reply_text(
+            update.message,
             "🤖 I don't understand that command. Use /start to begin or /admin for admin functions."
         )
 
-# Global instance for Lambda
-bot_instance = ChannelBotLambda()
+# Global instance for Lambda, created on first use
+bot_instance = None
+
+def get_bot_instance():
+    """Create the bot on first use"""
+    global bot_instance
+    if bot_instance is None:
+        bot_instance = ChannelBotLambda()
+    return bot_instance
 
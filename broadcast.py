@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+from config import BROADCAST_STATE_FILE, BROADCAST_BATCH_SIZE, BROADCAST_STATUS_INTERVAL
+from rate_limiter import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+class Broadcaster:
+    """Sends one message to every user, checkpointing progress so an interrupted run resumes"""
+    
+    def __init__(self, database, path=BROADCAST_STATE_FILE, batch_size=BROADCAST_BATCH_SIZE):
+        self.db = database
+        self.path = path
+        self.batch_size = batch_size
+        self.state = self.load()
+        self.cancelled = False
+        self.last_report = 0
+    
+    def load(self):
+        """Load the checkpoint of the last broadcast"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading broadcast state: {e}")
+            return None
+    
+    def save(self):
+        """Write the checkpoint"""
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving broadcast state: {e}")
+    
+    def is_running(self):
+        """Whether a broadcast is in progress (or was interrupted)"""
+        return bool(self.state) and self.state['status'] == 'running'
+    
+    def start(self, status_chat_id, status_message_id, text=None, from_chat_id=None, message_id=None):
+        """Begin a new broadcast of either a text or a copy of an existing message"""
+        self.cancelled = False
+        self.state = {
+            'status': 'running',
+            'text': text,
+            'from_chat_id': from_chat_id,
+            'message_id': message_id,
+            'status_chat_id': status_chat_id,
+            'status_message_id': status_message_id,
+            'cursor': None,
+            'total': self.db.count_users(include_blocked=False),
+            'sent': 0,
+            'failed': 0,
+            'blocked': 0,
+            'started_at': time.time()
+        }
+        self.save()
+    
+    def cancel(self):
+        """Stop the running broadcast after the current batch"""
+        self.cancelled = True
+    
+    async def run(self, bot):
+        """Send to every remaining user"""
+        # Runs as a background task for as long as it takes, so it needs a
+        # long-lived process (polling or the webhook server), not Lambda
+        state = self.state
+        run_started = time.monotonic()
+        processed_before = state['sent'] + state['failed'] + state['blocked']
+        
+        for batch in self.db.iter_user_ids(state['cursor'], self.batch_size):
+            if self.cancelled:
+                state['status'] = 'cancelled'
+                break
+            
+            results = await asyncio.gather(*[self.deliver(bot, user_id) for user_id in batch])
+            for result in results:
+                state[result] += 1
+            state['cursor'] = batch[-1]
+            self.save()
+            await self.report(bot, run_started, processed_before)
+        else:
+            state['status'] = 'done'
+        
+        self.save()
+        await self.report(bot, run_started, processed_before, force=True)
+    
+    async def deliver(self, bot, user_id):
+        """Send the broadcast to one user, returning 'sent', 'blocked' or 'failed'"""
+        state = self.state
+        # Bulk lane so interactive replies go first (needs the OutboundRateLimiter)
+        kwargs = {'rate_limit_args': {'priority': PRIORITY_BULK}} if getattr(bot, 'rate_limiter', None) else {}
+        try:
+            if state['text'] is not None:
+                await bot.send_message(user_id, state['text'], **kwargs)
+            else:
+                await bot.copy_message(user_id, state['from_chat_id'], state['message_id'], **kwargs)
+            return 'sent'
+        except Forbidden:
+            # Bot blocked or account deactivated, skip them in later broadcasts
+            self.db.mark_blocked(user_id)
+            return 'blocked'
+        except BadRequest as e:
+            if 'chat not found' in str(e).lower():
+                self.db.mark_blocked(user_id)
+                return 'blocked'
+            logger.warning(f"Broadcast to {user_id} failed: {e}")
+            return 'failed'
+        except TelegramError as e:
+            logger.warning(f"Broadcast to {user_id} failed: {e}")
+            return 'failed'
+    
+    def progress_text(self, run_started, processed_before):
+        """Status message text"""
+        state = self.state
+        processed = state['sent'] + state['failed'] + state['blocked']
+        elapsed = max(time.monotonic() - run_started, 0.001)
+        rate = (processed - processed_before) / elapsed
+        title = {
+            'running': '📣 Broadcast in progress',
+            'done': '✅ Broadcast finished',
+            'cancelled': '🛑 Broadcast cancelled'
+        }[state['status']]
+        return (
+            f"{title}\n\n"
+            f"Sent: {state['sent']}\n"
+            f"Failed: {state['failed']}\n"
+            f"Blocked/deactivated: {state['blocked']}\n"
+            f"Remaining: {max(state['total'] - processed, 0)}\n"
+            f"Speed: {rate:.1f} msgs/sec"
+        )
+    
+    async def report(self, bot, run_started, processed_before, force=False):
+        """Edit the admin's status message, at most every BROADCAST_STATUS_INTERVAL seconds"""
+        if not force and time.monotonic() - self.last_report < BROADCAST_STATUS_INTERVAL:
+            return
+        self.last_report = time.monotonic()
+        try:
+            await bot.edit_message_text(
+                self.progress_text(run_started, processed_before),
+                chat_id=self.state['status_chat_id'],
+                message_id=self.state['status_message_id']
+            )
+        except TelegramError as e:
+            logger.warning(f"Could not update broadcast status: {e}")
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from telegram.error import TelegramError
+
+from config import CHAT_INFO_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class ChatInfoCache:
+    """Cache of channel metadata so admin keyboards render without API calls"""
+    
+    def __init__(self):
+        self.entries = {}
+    
+    def get(self, channel_id):
+        """Return cached info for a channel, or None if it was never fetched"""
+        return self.entries.get(channel_id)
+    
+    def store(self, channel_id, title=None, chat_type=None, can_invite=False, error=None):
+        """Store channel info; an error marks the channel as unreadable"""
+        self.entries[channel_id] = {
+            'ok': error is None,
+            'title': title,
+            'type': chat_type,
+            'can_invite': can_invite,
+            'error': error,
+            'fetched_at': time.time()
+        }
+        return self.entries[channel_id]
+    
+    async def refresh(self, bot, channel_id):
+        """Fetch a channel's info from Telegram, caching failures as well"""
+        try:
+            chat = await bot.get_chat(channel_id)
+            me = await bot.get_chat_member(channel_id, bot.id)
+        except TelegramError as e:
+            logger.warning(f"Could not get chat info for {channel_id}: {e}")
+            return self.store(channel_id, error=str(e))
+        return self.store(channel_id, chat.title, chat.type, self.can_invite(me))
+    
+    async def warm(self, bot, channels):
+        """Fetch info for all channels concurrently"""
+        await asyncio.gather(*[self.refresh(bot, channel_id) for channel_id in channels])
+    
+    async def refresh_forever(self, bot, channels, interval=CHAT_INFO_REFRESH_INTERVAL):
+        """Re-fetch all channels every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.warm(bot, channels)
+            except Exception as e:
+                logger.error(f"Error refreshing chat info: {e}")
+    
+    def update_from_member(self, chat, member):
+        """Apply a my_chat_member update (bot promoted, demoted or removed)"""
+        if member.status in ["left", "kicked"]:
+            self.store(chat.id, chat.title, chat.type, error=f"Bot is no longer in the chat ({member.status})")
+        else:
+            self.store(chat.id, chat.title, chat.type, self.can_invite(member))
+    
+    @staticmethod
+    def can_invite(member):
+        """Whether the bot's own membership allows creating invite links"""
+        if member.status == "creator":
+            return True
+        return member.status == "administrator" and bool(getattr(member, "can_invite_users", False))
+
+# Shared cache for the bot process
+chat_info_cache = ChatInfoCache()
@@ -21,11 +21,143 @@ REQUIRED_CHANNELS = [
 # You can get the chat_id by forwarding a message from your channel to @RawDataBot.
 # Or, if the bot is already an admin, you can use a command like /get_chat_id in the channel.
 
+# Membership verification: how many get_chat_member calls may run at once
+# and how long (seconds) a single call may take before that channel counts
+# as not joined.
+MEMBERSHIP_CHECK_CONCURRENCY = 4
+MEMBERSHIP_CHECK_TIMEOUT = 5
+
+# Membership verdict cache, keyed by (user_id, channel_id). Negative verdicts
+# expire quickly so a user who has just joined is re-checked on the next press.
+MEMBERSHIP_CACHE_POSITIVE_TTL = 300
+MEMBERSHIP_CACHE_NEGATIVE_TTL = 10
+MEMBERSHIP_CACHE_SIZE = 100000
+
+# Local index of channel members, kept up to date from chat_member updates
+# (the bot must be an admin in each channel to receive them). Only joins are
+# trusted; anyone not indexed as joined is checked through the cache and API.
+MEMBERSHIP_INDEX_FILE = 'membership_index.log'
+
+# Channel metadata (title, type, invite permission) is fetched at startup and
+# refreshed in the background every CHAT_INFO_REFRESH_INTERVAL seconds
+CHAT_INFO_REFRESH_INTERVAL = 3600
+
+# Pool of pre-created single-use invite links per channel. A background job
+# tops each channel up to INVITE_POOL_SIZE once it drops below
+# INVITE_POOL_LOW_WATER, pausing INVITE_POOL_CREATE_DELAY seconds between
+# create_chat_invite_link calls to stay clear of rate limits.
+INVITE_POOL_FILE = 'invite_pool.json'
+INVITE_POOL_SIZE = 10
+INVITE_POOL_LOW_WATER = 3
+INVITE_POOL_CREATE_DELAY = 1
+INVITE_POOL_CHECK_INTERVAL = 60
+
+# Outbound rate limits (Telegram allows about 30 messages per second overall,
+# about 1 per second in a private chat and 20 per minute in a group).
+# Requests that still hit RetryAfter are retried up to RATE_LIMIT_MAX_RETRIES times.
+RATE_LIMIT_GLOBAL_PER_SECOND = 30
+RATE_LIMIT_PRIVATE_CHAT_PER_SECOND = 1
+RATE_LIMIT_PRIVATE_CHAT_BURST = 3
+RATE_LIMIT_GROUP_CHAT_PER_MINUTE = 20
+RATE_LIMIT_MAX_RETRIES = 3
+
 # Admin user IDs who can approve private links
 ADMIN_IDS = [OWNER_ID]  # Owner is automatically an admin
 
+# New link request notifications are batched into one digest per admin.
+# A digest goes out at most every ADMIN_DIGEST_INTERVAL seconds, or as soon as
+# ADMIN_DIGEST_MAX_EVENTS requests are waiting. With ADMIN_DIGEST_LIVE_MESSAGE
+# each admin gets one "N pending" message that is edited in place instead;
+# on AWS Lambda, which flushes after every invocation, that is always used.
+ADMIN_DIGEST_INTERVAL = 30
+ADMIN_DIGEST_MAX_EVENTS = 20
+ADMIN_DIGEST_LIVE_MESSAGE = os.getenv('ADMIN_DIGEST_LIVE_MESSAGE', 'false').lower() == 'true'
+
+# /broadcast sends to BROADCAST_BATCH_SIZE users at a time, saving progress to
+# BROADCAST_STATE_FILE after each batch, and edits the admin's status message
+# at most every BROADCAST_STATUS_INTERVAL seconds
+BROADCAST_STATE_FILE = 'broadcast_state.json'
+BROADCAST_BATCH_SIZE = 30
+BROADCAST_STATUS_INTERVAL = 5
+
+# Number of link requests shown per page in /pending
+PENDING_PAGE_SIZE = 10
+
+# AWS Lambda: keep one event loop and an initialized Application per
+# container so warm invocations reuse the HTTP connection pool
+LAMBDA_REUSE_EVENT_LOOP = os.getenv('LAMBDA_REUSE_EVENT_LOOP', 'true').lower() == 'true'
+
+# Webhook mode: send a handler's simple final reply as the body of the webhook
+# HTTP response instead of a separate sendMessage call
+WEBHOOK_REPLY_ENABLED = os.getenv('WEBHOOK_REPLY_ENABLED', 'true').lower() == 'true'
+
+# Webhook mode: drop updates whose update_id was already processed. The last
+# UPDATE_DEDUPE_SIZE processed ids are kept in memory and written to
+# UPDATE_DEDUPE_FILE once per invocation so they survive a restart. On Lambda
+# only /tmp is writable and it belongs to one container: point
+# UPDATE_DEDUPE_FILE at a shared mount (e.g. EFS) to drop redeliveries that
+# land on another container too.
+UPDATE_DEDUPE_FILE = os.getenv('UPDATE_DEDUPE_FILE', 'processed_updates.json')
+UPDATE_DEDUPE_SIZE = 1000
+
+# AWS Lambda behind a queue: updates from a batched event (a `Records` array)
+# for different users are processed concurrently, at most this many at once
+LAMBDA_BATCH_CONCURRENCY = 10
+
+# How bot.py receives updates: 'polling' (getUpdates) or 'webhook' (built-in
+# HTTP server). In webhook mode Telegram POSTs to WEBHOOK_PATH on
+# WEBHOOK_LISTEN:WEBHOOK_PORT and GET /health reports liveness. If WEBHOOK_URL
+# (the public base URL) is set, the webhook is registered with Telegram on startup.
+# WEBHOOK_SECRET_TOKEN is required in webhook mode; requests without it are rejected.
+RUN_MODE = os.getenv('RUN_MODE', 'polling').lower()
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_MAX_CONNECTIONS = 40
+WEBHOOK_MAX_BODY_SIZE = 1024 * 1024
+WEBHOOK_IDLE_TIMEOUT = 60
+
+# Updates from different users are processed in parallel on up to
+# UPDATE_WORKERS workers; each user's own updates run one at a time, in order.
+# At most UPDATE_MAX_PENDING updates are admitted before new ones wait.
+UPDATE_WORKERS = 8
+UPDATE_MAX_PENDING = 1000
+
 # Database file for storing user data and pending requests
 DATABASE_FILE = 'bot_data.json'
+# The snapshot DATABASE_FILE replaced, used if DATABASE_FILE fails its checksum
+DATABASE_PREVIOUS_FILE = 'bot_data.json.prev'
+
+# Storage backend: 'json' (DATABASE_FILE) or 'sqlite' (SQLITE_DATABASE_FILE).
+# Run `python sqlite_database.py` once to migrate an existing DATABASE_FILE.
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'json').lower()
+SQLITE_DATABASE_FILE = 'bot_data.db'
+
+# Journal mode: each mutation is appended as one compact record to
+# DATABASE_JOURNAL_FILE instead of rewriting DATABASE_FILE. The journal is
+# replayed on startup and compacted into a fresh snapshot every
+# DATABASE_COMPACT_EVERY records.
+DATABASE_JOURNAL_ENABLED = os.getenv('DATABASE_JOURNAL_ENABLED', 'true').lower() == 'true'
+DATABASE_JOURNAL_FILE = 'bot_data.journal'
+DATABASE_COMPACT_EVERY = 1000
+
+# Changes are written by a background thread. Changes made within
+# DATABASE_FLUSH_INTERVAL seconds of each other share one write and fsync;
+# DATABASE_FLUSH_MAX_DIRTY waiting changes are written without waiting longer.
+DATABASE_FLUSH_INTERVAL = 0.05
+DATABASE_FLUSH_MAX_DIRTY = 100
+
+# Users are split over DATABASE_SHARDS files by user id, each with its own
+# journal, lock and writer thread. The count in use is kept in
+# DATABASE_SHARD_MANIFEST_FILE; change it with `python reshard.py <count>`
+# (offline) or /reshard <count> (while the bot runs), up to DATABASE_MAX_SHARDS.
+DATABASE_SHARDS = int(os.getenv('DATABASE_SHARDS', '4'))
+DATABASE_MAX_SHARDS = 64
+DATABASE_SHARD_FILE = 'bot_data.users.{index}-of-{count}.json'
+DATABASE_SHARD_JOURNAL_FILE = 'bot_data.users.{index}-of-{count}.journal'
+DATABASE_SHARD_MANIFEST_FILE = 'bot_data.shards'
 
 # Messages
 WELCOME_MESSAGE = """
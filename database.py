@@ -1,78 +1,889 @@
+import asyncio
+import atexit
+import bisect
+import glob
+import hashlib
+import heapq
 import json
 import os
+import sys
+import threading
 from datetime import datetime
-from config import DATABASE_FILE
+from snapshot import SnapshotFile, SnapshotWriter, dumps, fsync_directory, is_snapshot_file, record_crc, write_snapshot
+from config import (
+    DATABASE_BACKEND, DATABASE_FILE, DATABASE_PREVIOUS_FILE, DATABASE_JOURNAL_ENABLED, DATABASE_JOURNAL_FILE,
+    DATABASE_COMPACT_EVERY, DATABASE_FLUSH_INTERVAL, DATABASE_FLUSH_MAX_DIRTY,
+    DATABASE_SHARDS, DATABASE_MAX_SHARDS, DATABASE_SHARD_FILE, DATABASE_SHARD_JOURNAL_FILE, DATABASE_SHARD_MANIFEST_FILE
+)
 
-class Database:
-    def __init__(self):
+def read_legacy_snapshot(path):
+    """Read a snapshot written before the indexed format, returns (data, seq)"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    first_line, _, body = content.partition(b'\n')
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or 'checksum' not in header:
+        # Plain JSON written before snapshots had a header
+        return json.loads(content), 0
+    
+    if len(body) != header['length'] or hashlib.sha256(body).hexdigest() != header['checksum']:
+        raise ValueError(f"checksum mismatch in {path}")
+    return json.loads(body), header['seq']
+
+def open_snapshot(path):
+    """Open a snapshot of any format, returns (data, user_file, seq)"""
+    # Indexed snapshots leave users in the mapped file; older ones carry them in data
+    if is_snapshot_file(path):
+        user_file = SnapshotFile(path)
+        return dict(user_file.links), user_file, user_file.header['seq']
+    data, seq = read_legacy_snapshot(path)
+    return data, None, seq
+
+class LinkRequestStore:
+    """Link requests indexed by id, status and user"""
+    
+    def __init__(self, requests):
+        # The list is shared with Database.data and is what gets persisted
+        self.requests = requests
+        self.by_id = {}
+        self.by_status = {}
+        self.status_ids = {}
+        self.by_user = {}
+        self.next_id = 1
+        for req in requests:
+            self.index(req)
+    
+    def index(self, req):
+        """Add a request to the indexes"""
+        self.by_id[req['id']] = req
+        self.by_status.setdefault(req['status'], {})[req['id']] = req
+        bisect.insort(self.status_ids.setdefault(req['status'], []), req['id'])
+        self.by_user.setdefault(req['user_id'], {})[req['id']] = req
+        self.next_id = max(self.next_id, req['id'] + 1)
+    
+    def allocate_id(self):
+        """Return the next unused request id"""
+        return self.next_id
+    
+    def add(self, req):
+        """Store a new request"""
+        self.requests.append(req)
+        self.index(req)
+    
+    def get(self, request_id):
+        """Get a request by id"""
+        return self.by_id.get(request_id)
+    
+    def set_status(self, req, status):
+        """Move a request to another status index"""
+        self.by_status.get(req['status'], {}).pop(req['id'], None)
+        ids = self.status_ids.get(req['status'], [])
+        position = bisect.bisect_left(ids, req['id'])
+        if position < len(ids) and ids[position] == req['id']:
+            del ids[position]
+        
+        req['status'] = status
+        self.by_status.setdefault(status, {})[req['id']] = req
+        bisect.insort(self.status_ids.setdefault(status, []), req['id'])
+    
+    def page(self, status, after_id=None, before_id=None, limit=10):
+        """A page of requests with a given status around a cursor id, returns (requests, has_prev, has_next)"""
+        ids = self.status_ids.get(status, [])
+        if before_id is not None:
+            end = bisect.bisect_left(ids, before_id)
+            start = max(0, end - limit)
+        else:
+            start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+            end = min(len(ids), start + limit)
+        return [self.by_id[request_id] for request_id in ids[start:end]], start > 0, end < len(ids)
+    
+    def with_status(self, status):
+        """All requests with a given status, oldest first"""
+        return list(self.by_status.get(status, {}).values())
+    
+    def count(self, status):
+        """Number of requests with a given status"""
+        return len(self.by_status.get(status, {}))
+    
+    def for_user(self, user_id):
+        """All requests made by a user, oldest first"""
+        return list(self.by_user.get(user_id, {}).values())
+
+HAS_ACCESS = 1
+BLOCKED = 2
+
+def to_epoch(value):
+    """ISO timestamp string to int epoch seconds (None stays None)"""
+    if value is None:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+def from_epoch(value):
+    """Int epoch seconds back to the ISO string the rest of the bot expects"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value).isoformat()
+
+class UserRecord:
+    """One user; ints for timestamps and a flags bitfield keep it small"""
+    
+    __slots__ = ('username', 'first_name', 'joined_at', 'last_check', 'flags')
+    
+    def __init__(self, username, first_name, joined_at, last_check=None, flags=0):
+        self.username = username
+        # First names repeat a lot across users; share one string per name
+        self.first_name = sys.intern(first_name) if first_name else first_name
+        self.joined_at = joined_at
+        self.last_check = last_check
+        self.flags = flags
+    
+    @property
+    def has_access(self):
+        return bool(self.flags & HAS_ACCESS)
+    
+    @property
+    def blocked(self):
+        return bool(self.flags & BLOCKED)
+    
+    def set_flag(self, flag, value):
+        """Set or clear one flag bit"""
+        self.flags = self.flags | flag if value else self.flags & ~flag
+    
+    @classmethod
+    def from_fields(cls, fields, flags):
+        """Build a record from a decoded snapshot line"""
+        _, username, first_name, joined_at, last_check = fields
+        return cls(username, first_name, joined_at, last_check, flags)
+    
+    def encode(self, user_id):
+        """The snapshot line for this record"""
+        return dumps([user_id, self.username, self.first_name, self.joined_at, self.last_check])
+    
+    @classmethod
+    def from_dict(cls, user):
+        """Build a record from the dict shape stored in snapshots"""
+        flags = (HAS_ACCESS if user.get('has_access') else 0) | (BLOCKED if user.get('blocked') else 0)
+        return cls(
+            user.get('username'), user.get('first_name'), to_epoch(user.get('joined_at')) or 0,
+            to_epoch(user.get('last_check')), flags
+        )
+    
+    def to_dict(self):
+        """The dict shape stored in snapshots and returned by get_user"""
+        user = {
+            'username': self.username,
+            'first_name': self.first_name,
+            'joined_at': from_epoch(self.joined_at),
+            'has_access': self.has_access,
+            'last_check': from_epoch(self.last_check)
+        }
+        if self.blocked:
+            user['blocked'] = True
+        return user
+
+class UserTable:
+    """Users keyed by int id, decoded from the snapshot file as they are first used"""
+    
+    def __init__(self, users, base=None, fallback_path=None):
+        # Users decoded from base, added, or loaded from an older snapshot format
+        self.records = {int(user_id): UserRecord.from_dict(user) for user_id, user in users.items()}
+        self.base = base
+        self.fallback_path = fallback_path
+        # Mapped now: compaction rotates base into fallback_path, and the
+        # generation before base is what a damaged record is repaired from
+        self.fallback = self.open_fallback()
+        self.base_count = base.count if base is not None else 0
+        self.added = len(self.records)
+    
+    def get(self, user_id):
+        """Get a user's record"""
+        user_id = int(user_id)
+        record = self.records.get(user_id)
+        if record is None and self.base is not None:
+            record = self.decode(user_id)
+            if record is not None:
+                self.records[user_id] = record
+        return record
+    
+    def decode(self, user_id):
+        """Decode a user from the snapshot file, trying the previous generation if its record is damaged"""
+        try:
+            found = self.base.record(user_id)
+        except ValueError as e:
+            print(f"Error reading user: {e}")
+            found = self.decode_fallback(user_id)
+        return UserRecord.from_fields(*found) if found is not None else None
+    
+    def open_fallback(self):
+        """Map the previous snapshot generation, if there is a readable one"""
+        if not self.fallback_path or not os.path.exists(self.fallback_path):
+            return None
+        try:
+            if is_snapshot_file(self.fallback_path):
+                return SnapshotFile(self.fallback_path)
+        except Exception as e:
+            print(f"Error loading {self.fallback_path}: {e}")
+        return None
+    
+    def decode_fallback(self, user_id):
+        """A user's record from the previous snapshot generation"""
+        return UserTable.read_fallback(self.fallback, user_id)
+    
+    @staticmethod
+    def read_fallback(fallback, user_id):
+        """(fields, flags) for a user from a previous generation, None if absent or damaged there too"""
+        if fallback is None:
+            return None
+        try:
+            return fallback.record(user_id)
+        except ValueError as e:
+            print(f"Error reading user from {fallback.path}: {e}")
+            return None
+    
+    def add(self, user_id, record):
+        """Store a new user"""
+        self.records[int(user_id)] = record
+        self.added += 1
+    
+    def in_base(self, user_id):
+        return self.base is not None and self.base.find(user_id) >= 0
+    
+    def flags(self):
+        """(user_id, flags) for every user, without decoding records"""
+        if self.base is not None:
+            for user_id, _, _, flags in self.base.entries():
+                record = self.records.get(user_id)
+                yield user_id, record.flags if record is not None else flags
+        for user_id, record in self.records.items():
+            if not self.in_base(user_id):
+                yield user_id, record.flags
+    
+    def count(self, include_blocked=True):
+        """Number of users"""
+        if include_blocked:
+            return self.base_count + self.added
+        return sum(1 for _, flags in self.flags() if not flags & BLOCKED)
+    
+    def reachable_ids(self):
+        """Sorted ids of users who have not blocked the bot"""
+        return sorted(user_id for user_id, flags in self.flags() if not flags & BLOCKED)
+    
+    def all_records(self):
+        """Every user decoded, keyed by id"""
+        records = {}
+        if self.base is not None:
+            for user_id, _, _, _ in self.base.entries():
+                records[user_id] = self.get(user_id)
+        records.update(self.records)
+        return records
+    
+    @staticmethod
+    def to_json(records):
+        """Records in the snapshot shape, keyed by stringified id"""
+        return {str(user_id): record.to_dict() for user_id, record in records.items()}
+    
+    @staticmethod
+    def lines(records, base, fallback=None):
+        """(user_id, line, flags) for every user in id order, copying unchanged lines from base as they are"""
+        overlay = sorted(records.items())
+        position = 0
+        if base is not None:
+            for user_id, offset, crc, flags in base.entries():
+                while position < len(overlay) and overlay[position][0] < user_id:
+                    new_id, record = overlay[position]
+                    yield new_id, record.encode(new_id), record.flags
+                    position += 1
+                if position < len(overlay) and overlay[position][0] == user_id:
+                    record = overlay[position][1]
+                    yield user_id, record.encode(user_id), record.flags
+                    position += 1
+                else:
+                    line = base.line(offset)
+                    if record_crc(line, flags) != crc:
+                        line, flags = UserTable.repair(user_id, base, fallback)
+                    yield user_id, line, flags
+        for user_id, record in overlay[position:]:
+            yield user_id, record.encode(user_id), record.flags
+    
+    @staticmethod
+    def repair(user_id, base, fallback):
+        """(line, flags) for a user whose line in base is damaged, from the previous generation"""
+        # Copying the damaged line would give it a fresh, valid checksum and
+        # hide the damage for good; fail the write instead if there is no copy
+        found = UserTable.read_fallback(fallback, user_id)
+        if found is None:
+            raise ValueError(f"checksum mismatch for user {user_id} in {base.path} and no intact copy to repair it from")
+        print(f"⚠️ Repaired user {user_id} from {fallback.path}")
+        record = UserRecord.from_fields(*found)
+        return record.encode(user_id), record.flags
+
+class Partition:
+    """One snapshot file and its journal, with its own lock and background writer thread"""
+    
+    # Mutations are applied in memory on the caller's thread and written to
+    # disk by the partition's writer thread, so handlers never wait on file
+    # I/O. `lock` guards the data against the writer copying it mid-mutation;
+    # `io_lock` keeps one flush at a time.
+    
+    def __init__(self, path, previous_path, journal_path):
+        self.path = path
+        self.previous_path = previous_path
+        self.journal_path = journal_path
+        self.journal_enabled = DATABASE_JOURNAL_ENABLED
+        self.journal_records = 0
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.pending_records = []
+        self.dirty = 0
+        self.wakeup = threading.Event()
+        self.full = threading.Event()
+        self.writer = None
+        self.closed = False
+        self.user_file = None
         self.data = self.load_data()
     
     def load_data(self):
-        """Load data from JSON file"""
-        if os.path.exists(DATABASE_FILE):
+        """Load the newest readable snapshot generation"""
+        data = None
+        for path in (self.path, self.previous_path):
+            if not os.path.exists(path):
+                continue
             try:
-                with open(DATABASE_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                return self.get_default_data()
-        return self.get_default_data()
+                data, self.user_file, self.snapshot_seq = open_snapshot(path)
+            except Exception as e:
+                print(f"Error loading {path}: {e}")
+                continue
+            if path != self.path:
+                print(f"⚠️ Loaded the previous snapshot generation from {path}")
+            break
+        
+        if os.path.exists(self.path) and (data is None or path != self.path):
+            # Keep a damaged snapshot for recovery, and out of the way of the
+            # next write, which would otherwise rotate it into the previous slot
+            os.replace(self.path, self.path + '.corrupt')
+            print(f"❌ Moved unreadable {self.path} to {self.path}.corrupt")
+        
+        if data is None:
+            return self.get_default_data()
+        self.seq = self.snapshot_seq
+        return data
+    
+    def get_default_data(self):
+        """Return default data for an empty partition"""
+        return {}
+    
+    def save_data(self, data=None, seq=None):
+        """Save data (or a snapshot of it) to the partition's file"""
+        try:
+            links, users = self.contents(self.snapshot() if data is None else data)
+            write_snapshot(self.path, self.previous_path, links, users, self.seq if seq is None else seq)
+        except Exception as e:
+            print(f"Error saving {self.path}: {e}")
+            return False
+        return True
+    
+    def replay_journal(self):
+        """Apply journal records written since the last snapshot"""
+        if not os.path.exists(self.journal_path):
+            return
+        try:
+            complete = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn last line from a crash mid-append; its
+                        # record was never acknowledged
+                        print(f"Dropping torn journal record: {line[:80]!r}")
+                        break
+                    complete += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        print(f"Skipping unreadable journal record: {line[:80]!r}")
+                        continue
+                    seq = record.get('seq', 0)
+                    if seq and seq <= self.snapshot_seq:
+                        # Already in the snapshot; the journal was not
+                        # truncated before a crash
+                        continue
+                    self.apply(record)
+                    self.seq = max(self.seq, seq)
+                    self.journal_records += 1
+            
+            if complete < os.path.getsize(self.journal_path):
+                # Cut the fragment off so the next append starts on a fresh
+                # line instead of being glued onto it (and lost on replay)
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(complete)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+    
+    def compact(self):
+        """Write a full snapshot and truncate the journal"""
+        self.flush_sync(compact=True)
+    
+    def commit(self, record):
+        """Apply a mutation record and queue it for the background writer"""
+        with self.lock:
+            if not self.apply(record):
+                return False
+            self.seq += 1
+            record['seq'] = self.seq
+            self.dirty += 1
+            if self.journal_enabled:
+                self.pending_records.append(json.dumps(record, separators=(',', ':')) + '\n')
+        
+        if self.writer is None:
+            self.start_writer()
+        self.wakeup.set()
+        if self.dirty >= DATABASE_FLUSH_MAX_DIRTY:
+            self.full.set()
+        return True
+    
+    def start_writer(self):
+        """Start the background writer thread"""
+        self.writer = threading.Thread(
+            target=self.write_forever, name=f'writer-{os.path.basename(self.path)}', daemon=True
+        )
+        self.writer.start()
+        atexit.register(self.close)
+    
+    def write_forever(self):
+        """Group commit: gather changes for DATABASE_FLUSH_INTERVAL after the first one, then write them with one fsync"""
+        while not self.closed:
+            self.wakeup.wait()
+            self.full.wait(DATABASE_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            self.full.clear()
+            self.flush_sync()
+    
+    def flush_sync(self, compact=False):
+        """Write queued changes to disk, blocking until done"""
+        with self.io_lock:
+            with self.lock:
+                records, self.pending_records = self.pending_records, []
+                dirty, self.dirty = self.dirty, 0
+                seq = self.seq
+                snapshot = None
+                if compact or (dirty and (not self.journal_enabled
+                                          or self.journal_records + len(records) >= DATABASE_COMPACT_EVERY)):
+                    snapshot = self.snapshot()
+            
+            if snapshot is not None:
+                # The snapshot already contains the queued records
+                if not self.save_data(snapshot, seq):
+                    self.requeue(records, dirty)
+                    return False
+                if self.journal_enabled:
+                    try:
+                        open(self.journal_path, 'w').close()
+                        self.journal_records = 0
+                    except Exception as e:
+                        print(f"Error truncating journal: {e}")
+                return True
+            
+            if records:
+                try:
+                    with open(self.journal_path, 'a') as f:
+                        f.write(''.join(records))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    self.journal_records += len(records)
+                except Exception as e:
+                    print(f"Error writing journal: {e}")
+                    self.requeue(records, dirty)
+                    return False
+            return True
+    
+    def requeue(self, records, dirty):
+        """Put changes from a failed flush back in front of newer ones"""
+        with self.lock:
+            self.pending_records[:0] = records
+            self.dirty += dirty
+    
+    async def flush(self):
+        """Wait until every change made so far is on disk, raises OSError if writing failed"""
+        if not await asyncio.get_running_loop().run_in_executor(None, self.flush_sync):
+            # The changes stay queued and are retried by the next flush
+            raise OSError(f"could not write {self.path}")
+    
+    def close(self):
+        """Stop the writer thread and flush what is left"""
+        if self.writer is not None and not self.closed:
+            self.closed = True
+            self.wakeup.set()
+            self.full.set()
+            self.writer.join()
+            atexit.unregister(self.close)
+        self.flush_sync()
+    
+    def remove_files(self):
+        """Delete the partition's snapshot generations and journal"""
+        for path in (self.path, self.previous_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class UserShard(Partition):
+    """The users whose id maps to one shard"""
+    
+    def __init__(self, index, count):
+        path = DATABASE_SHARD_FILE.format(index=index, count=count)
+        super().__init__(path, path + '.prev', DATABASE_SHARD_JOURNAL_FILE.format(index=index, count=count))
+        fallback_path = self.previous_path if self.user_file and self.user_file.path == self.path else None
+        self.users = UserTable(self.data.pop('users', {}), self.user_file, fallback_path)
+        if self.journal_enabled:
+            self.replay_journal()
+    
+    def snapshot(self):
+        """Copy the user map so the writer can serialize it while handlers keep mutating"""
+        # User records are shared, not copied, so a change made while the
+        # writer serializes may land in this snapshot early. That is harmless:
+        # every user op is idempotent, and replay re-applies it anyway.
+        return {'users': (dict(self.users.records), self.users.base, self.users.fallback)}
+    
+    def contents(self, snapshot):
+        """(links, user lines) to write for a snapshot"""
+        return {}, UserTable.lines(*snapshot['users'])
+    
+    def import_user(self, user_id, record):
+        """Take over a user from an unsharded snapshot unless this shard already has newer data"""
+        if self.users.get(user_id) is None:
+            self.users.add(user_id, record)
+    
+    def apply(self, record):
+        """Apply a single user mutation record to the in-memory data"""
+        op = record['op']
+        
+        if op == 'add_user':
+            user = self.users.get(record['user_id'])
+            if user is None:
+                self.users.add(record['user_id'], UserRecord(
+                    record['username'], record['first_name'], to_epoch(record['joined_at']) or 0
+                ))
+            else:
+                user.username = record['username']
+                user.first_name = sys.intern(record['first_name']) if record['first_name'] else record['first_name']
+                # Writing to the bot again means they unblocked it
+                user.set_flag(BLOCKED, False)
+            return True
+        
+        if op == 'mark_blocked':
+            user = self.users.get(record['user_id'])
+            if user is None or user.blocked:
+                return False
+            user.set_flag(BLOCKED, True)
+            return True
+        
+        if op == 'grant_access':
+            user = self.users.get(record['user_id'])
+            if user is None:
+                return False
+            user.set_flag(HAS_ACCESS, True)
+            user.last_check = to_epoch(record['last_check'])
+            return True
+        
+        if op == 'revoke_access':
+            user = self.users.get(record['user_id'])
+            if user is None or not user.has_access:
+                return False
+            user.set_flag(HAS_ACCESS, False)
+            user.last_check = to_epoch(record['last_check'])
+            return True
+        
+        print(f"Unknown journal op: {op}")
+        return False
+
+def read_shard_count():
+    """The shard count in use, from the manifest (or DATABASE_SHARDS for a new database)"""
+    if not os.path.exists(DATABASE_SHARD_MANIFEST_FILE):
+        write_shard_count(DATABASE_SHARDS)
+        return DATABASE_SHARDS
+    with open(DATABASE_SHARD_MANIFEST_FILE, 'r') as f:
+        count = json.load(f)['count']
+    if count != DATABASE_SHARDS:
+        print(f"⚠️ Users are in {count} shards but DATABASE_SHARDS is {DATABASE_SHARDS}; "
+              f"run `python reshard.py {DATABASE_SHARDS}` or /reshard to change it")
+    return count
+
+def write_shard_count(count):
+    """Atomically record which shard files are current"""
+    tmp_path = DATABASE_SHARD_MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'count': count}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, DATABASE_SHARD_MANIFEST_FILE)
+    fsync_directory(DATABASE_SHARD_MANIFEST_FILE)
+
+def remove_stale_shards(count):
+    """Delete shard files for any count other than the one in use"""
+    # Left behind when a reshard is interrupted: the new files before the
+    # manifest switched over, or the old ones after it did
+    active = set()
+    for index in range(count):
+        path = DATABASE_SHARD_FILE.format(index=index, count=count)
+        active.update((path, path + '.prev', path + '.tmp', DATABASE_SHARD_JOURNAL_FILE.format(index=index, count=count)))
+    any_shard = DATABASE_SHARD_FILE.format(index='*', count='*')
+    for pattern in (any_shard, any_shard + '.prev', any_shard + '.tmp',
+                    DATABASE_SHARD_JOURNAL_FILE.format(index='*', count='*')):
+        for path in glob.glob(pattern):
+            if path not in active:
+                os.remove(path)
+                print(f"Removed {path}, left over from an interrupted reshard")
+
+def write_shards(snapshots, count):
+    """Write the users from shard snapshots into `count` new shard files"""
+    writers = []
+    try:
+        for index in range(count):
+            path = DATABASE_SHARD_FILE.format(index=index, count=count)
+            # Leftovers from an interrupted reshard to the same count
+            for stale in (path, path + '.prev', DATABASE_SHARD_JOURNAL_FILE.format(index=index, count=count)):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            writers.append(SnapshotWriter(path, path + '.prev', {}))
+        # One pass over all users in id order, each line read once and
+        # appended to its new shard, which keeps every file in id order too
+        users = heapq.merge(*(UserTable.lines(*snapshot) for snapshot in snapshots), key=lambda item: item[0])
+        for user_id, line, flags in users:
+            writers[user_id % count].add(user_id, line, flags)
+        for writer in writers:
+            writer.commit(0)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+
+class Database(Partition):
+    """Link requests in DATABASE_FILE, users spread over hash-sharded files"""
+    
+    # Each user shard has its own files, lock and writer thread, so changes
+    # for users in different shards never wait on the same write.
+    
+    def __init__(self):
+        super().__init__(DATABASE_FILE, DATABASE_PREVIOUS_FILE, DATABASE_JOURNAL_FILE)
+        manifest_exists = os.path.exists(DATABASE_SHARD_MANIFEST_FILE)
+        count = read_shard_count()
+        if manifest_exists:
+            remove_stale_shards(count)
+        self.shards = [UserShard(index, count) for index in range(count)]
+        self.reshard_log = None
+        self.resharding = False
+        self.migrated = False
+        self.link_requests = LinkRequestStore(self.data['pending_links'])
+        
+        # Users stored in DATABASE_FILE itself by versions before sharding
+        fallback_path = self.previous_path if self.user_file and self.user_file.path == self.path else None
+        unsharded = UserTable(self.data.pop('users', {}), self.user_file, fallback_path)
+        if unsharded.count():
+            for user_id, record in unsharded.all_records().items():
+                self.shard_for(user_id).import_user(user_id, record)
+            self.migrated = True
+        if self.journal_enabled:
+            self.replay_journal()
+        if self.migrated:
+            # Shards first, so the users are safe before DATABASE_FILE drops them
+            self.compact()
+            print(f"✅ Moved {self.count_users()} users into {len(self.shards)} shards")
     
     def get_default_data(self):
         """Return default database structure"""
         return {
-            'users': {},
             'pending_links': [],
             'approved_links': []
         }
     
-    def save_data(self):
-        """Save data to JSON file"""
+    def snapshot(self):
+        """Copy the link request lists so the writer can serialize them while handlers keep mutating"""
+        return {
+            'pending_links': [dict(req) for req in self.data['pending_links']],
+            'approved_links': [dict(req) for req in self.data['approved_links']]
+        }
+    
+    def contents(self, snapshot):
+        """(links, user lines) to write for a snapshot"""
+        return snapshot, iter(())
+    
+    def shard_for(self, user_id):
+        """The shard that holds a user"""
+        return self.shards[int(user_id) % len(self.shards)]
+    
+    def commit_user(self, record):
+        """Commit a user mutation to the user's shard"""
+        if self.reshard_log is not None:
+            self.reshard_log.append(dict(record))
+        return self.shard_for(record['user_id']).commit(record)
+    
+    def compact(self):
+        """Write full snapshots of every shard and of the link requests"""
+        for shard in self.shards:
+            shard.compact()
+        super().compact()
+    
+    async def flush(self):
+        """Wait until every change made so far is on disk, raises OSError if any partition failed"""
+        await asyncio.gather(super().flush(), *(shard.flush() for shard in self.shards))
+    
+    def close(self):
+        """Stop every writer thread and flush what is left"""
+        for shard in self.shards:
+            shard.close()
+        super().close()
+    
+    async def reshard(self, count):
+        """Move every user into `count` shards while the bot keeps running"""
+        # Must be awaited on the thread that makes changes (the bot's event
+        # loop): changes made while the new files are written are logged and
+        # replayed, and the final switch runs without yielding.
+        if not 1 <= count <= DATABASE_MAX_SHARDS:
+            raise ValueError(f"shard count must be between 1 and {DATABASE_MAX_SHARDS}")
+        if self.resharding:
+            raise RuntimeError("a reshard is already running")
+        if count == len(self.shards):
+            return False
+        
+        self.resharding = True
         try:
-            with open(DATABASE_FILE, 'w') as f:
-                json.dump(self.data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving data: {e}")
+            await self.flush()
+            self.reshard_log = []
+            snapshots = []
+            for shard in self.shards:
+                with shard.lock:
+                    snapshots.append(shard.snapshot()['users'])
+            await asyncio.get_running_loop().run_in_executor(None, write_shards, snapshots, count)
+            new_shards = [UserShard(index, count) for index in range(count)]
+            
+            for record in self.reshard_log:
+                new_shards[int(record['user_id']) % count].commit(record)
+            self.reshard_log = None
+            for shard in new_shards:
+                shard.flush_sync()
+            # The manifest is the switch-over point; before it the old shards are current
+            write_shard_count(count)
+        finally:
+            self.reshard_log = None
+            self.resharding = False
+        
+        old_shards, self.shards = self.shards, new_shards
+        for shard in old_shards:
+            shard.close()
+            shard.remove_files()
+        return True
+    
+    def export(self):
+        """Everything with every user decoded, in the plain JSON shape"""
+        users = {}
+        for shard in self.shards:
+            users.update(UserTable.to_json(shard.users.all_records()))
+        return dict(self.snapshot(), users=users)
+    
+    def apply(self, record):
+        """Apply a single link request mutation record to the in-memory data"""
+        op = record['op']
+        
+        if op in ('add_user', 'mark_blocked', 'grant_access', 'revoke_access'):
+            # Written to this journal before users were sharded
+            self.migrated = True
+            return self.shard_for(record['user_id']).apply(record)
+        
+        if op == 'add_pending_link':
+            self.link_requests.add(dict(record['request']))
+            return True
+        
+        if op in ('approve_link', 'reject_link'):
+            req = self.link_requests.get(record['request_id'])
+            if req is None or req['status'] != 'pending':
+                return False
+            if op == 'approve_link':
+                self.link_requests.set_status(req, 'approved')
+                req['approved_by'] = record['admin_id']
+                req['approved_at'] = record['at']
+                req['private_link'] = record['private_link']
+                
+                # Move to approved links
+                self.data['approved_links'].append(req.copy())
+            else:
+                self.link_requests.set_status(req, 'rejected')
+                req['rejected_by'] = record['admin_id']
+                req['rejected_at'] = record['at']
+                if record.get('reason'):
+                    req['rejection_reason'] = record['reason']
+            return True
+        
+        print(f"Unknown journal op: {op}")
+        return False
     
     def add_user(self, user_id, username=None, first_name=None):
         """Add or update user in database"""
-        user_id = str(user_id)
-        if user_id not in self.data['users']:
-            self.data['users'][user_id] = {
-                'username': username,
-                'first_name': first_name,
-                'joined_at': datetime.now().isoformat(),
-                'has_access': False,
-                'last_check': None
-            }
-        else:
-            # Update user info
-            self.data['users'][user_id]['username'] = username
-            self.data['users'][user_id]['first_name'] = first_name
+        user = self.shard_for(user_id).users.get(user_id)
+        if (user is not None and user.username == username and user.first_name == first_name
+                and not user.blocked):
+            # Nothing changed, skip the write
+            return
         
-        self.save_data()
+        self.commit_user({
+            'op': 'add_user',
+            'user_id': str(user_id),
+            'username': username,
+            'first_name': first_name,
+            'joined_at': datetime.now().isoformat()
+        })
     
     def grant_access(self, user_id):
         """Grant access to user"""
-        user_id = str(user_id)
-        if user_id in self.data['users']:
-            self.data['users'][user_id]['has_access'] = True
-            self.data['users'][user_id]['last_check'] = datetime.now().isoformat()
-            self.save_data()
+        self.commit_user({
+            'op': 'grant_access',
+            'user_id': str(user_id),
+            'last_check': datetime.now().isoformat()
+        })
+    
+    def revoke_access(self, user_id):
+        """Revoke access from user"""
+        self.commit_user({
+            'op': 'revoke_access',
+            'user_id': str(user_id),
+            'last_check': datetime.now().isoformat()
+        })
     
     def has_access(self, user_id):
         """Check if user has access"""
-        user_id = str(user_id)
-        return self.data['users'].get(user_id, {}).get('has_access', False)
+        user = self.shard_for(user_id).users.get(user_id)
+        return user is not None and user.has_access
     
     def get_user(self, user_id):
         """Get user data"""
-        user_id = str(user_id)
-        return self.data['users'].get(user_id)
+        user = self.shard_for(user_id).users.get(user_id)
+        return user.to_dict() if user is not None else None
+    
+    def mark_blocked(self, user_id):
+        """Mark a user who blocked the bot or deleted their account"""
+        self.commit_user({'op': 'mark_blocked', 'user_id': str(user_id)})
+    
+    def count_users(self, include_blocked=True):
+        """Get the number of users"""
+        return sum(shard.users.count(include_blocked) for shard in self.shards)
+    
+    def iter_user_ids(self, after_id=None, batch_size=1000):
+        """Yield batches of reachable user ids in ascending order, starting after a cursor id"""
+        user_ids = list(heapq.merge(*(shard.users.reachable_ids() for shard in self.shards)))
+        start = bisect.bisect_right(user_ids, after_id) if after_id is not None else 0
+        for offset in range(start, len(user_ids), batch_size):
+            yield user_ids[offset:offset + batch_size]
     
     def add_pending_link(self, user_id, username, link_type, description):
         """Add pending link request"""
         request = {
-            'id': len(self.data['pending_links']) + 1,
+            'id': self.link_requests.allocate_id(),
             'user_id': user_id,
             'username': username,
             'link_type': link_type,
@@ -80,42 +891,73 @@ class Database:
             'requested_at': datetime.now().isoformat(),
             'status': 'pending'
         }
-        self.data['pending_links'].append(request)
-        self.save_data()
+        self.commit({'op': 'add_pending_link', 'request': request})
         return request['id']
     
     def get_pending_links(self):
         """Get all pending link requests"""
-        return [req for req in self.data['pending_links'] if req['status'] == 'pending']
+        return self.link_requests.with_status('pending')
+    
+    def count_pending_links(self):
+        """Get the number of pending link requests"""
+        return self.link_requests.count('pending')
+    
+    def get_pending_links_page(self, after_id=None, before_id=None, limit=10):
+        """Get a page of pending link requests, returns (requests, has_prev, has_next)"""
+        return self.link_requests.page('pending', after_id, before_id, limit)
+    
+    def get_pending_link(self, request_id):
+        """Get a link request by id if it is still pending"""
+        req = self.link_requests.get(request_id)
+        if req is None or req['status'] != 'pending':
+            return None
+        return req
+    
+    def get_link_request(self, request_id):
+        """Get a link request by id, whatever its status"""
+        return self.link_requests.get(request_id)
+    
+    def get_user_link_requests(self, user_id):
+        """Get all link requests made by a user"""
+        return self.link_requests.for_user(user_id)
     
     def approve_link(self, request_id, admin_id, private_link):
         """Approve a link request"""
-        for req in self.data['pending_links']:
-            if req['id'] == request_id and req['status'] == 'pending':
-                req['status'] = 'approved'
-                req['approved_by'] = admin_id
-                req['approved_at'] = datetime.now().isoformat()
-                req['private_link'] = private_link
-                
-                # Move to approved links
-                self.data['approved_links'].append(req.copy())
-                self.save_data()
-                return True
-        return False
+        return self.commit({
+            'op': 'approve_link',
+            'request_id': request_id,
+            'admin_id': admin_id,
+            'private_link': private_link,
+            'at': datetime.now().isoformat()
+        })
     
     def reject_link(self, request_id, admin_id, reason=None):
         """Reject a link request"""
-        for req in self.data['pending_links']:
-            if req['id'] == request_id and req['status'] == 'pending':
-                req['status'] = 'rejected'
-                req['rejected_by'] = admin_id
-                req['rejected_at'] = datetime.now().isoformat()
-                if reason:
-                    req['rejection_reason'] = reason
-                self.save_data()
-                return True
-        return False
+        return self.commit({
+            'op': 'reject_link',
+            'request_id': request_id,
+            'admin_id': admin_id,
+            'reason': reason,
+            'at': datetime.now().isoformat()
+        })
 
-# Global database instance
-db = Database()
+def create_database():
+    """Create the database backend selected by DATABASE_BACKEND"""
+    if DATABASE_BACKEND == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase()
+    return Database()
+
+class LazyDatabase:
+    """Stands in for the database and creates it on first use, so importing this module reads nothing from disk"""
+    
+    def __init__(self):
+        self.instance = None
+    
+    def __getattr__(self, name):
+        if self.instance is None:
+            self.instance = create_database()
+        return getattr(self.instance, name)
 
+# Global database instance, created on first use
+db = LazyDatabase()
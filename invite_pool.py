@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from telegram.error import RetryAfter, TelegramError
+
+from config import (
+    INVITE_POOL_FILE, INVITE_POOL_SIZE, INVITE_POOL_LOW_WATER,
+    INVITE_POOL_CREATE_DELAY, INVITE_POOL_CHECK_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+class InviteLinkPool:
+    """Per-channel pool of pre-created single-use invite links"""
+    
+    def __init__(self, path=INVITE_POOL_FILE, size=INVITE_POOL_SIZE, low_water=INVITE_POOL_LOW_WATER):
+        self.path = path
+        self.size = size
+        self.low_water = low_water
+        self.links = {}
+        self.created = 0
+        self.taken = 0
+        self.empty_takes = 0
+        self.started_at = time.monotonic()
+        self.wakeup = None
+        self.loaded = False
+    
+    def load(self):
+        """Load pooled links from disk"""
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.links = {int(channel_id): links for channel_id, links in json.load(f).items()}
+        except Exception as e:
+            logger.error(f"Error loading invite pool: {e}")
+    
+    def save(self):
+        """Write pooled links to disk"""
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.links, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving invite pool: {e}")
+    
+    def depth(self, channel_id):
+        """Number of ready links for a channel"""
+        if not self.loaded:
+            self.load()
+        return len(self.links.get(channel_id, []))
+    
+    def take(self, channel_id):
+        """Take a ready link for a channel, or None if the pool is empty"""
+        if not self.loaded:
+            self.load()
+        links = self.links.get(channel_id)
+        if not links:
+            self.empty_takes += 1
+            self.request_refill()
+            return None
+        link = links.pop(0)
+        self.taken += 1
+        self.save()
+        if len(links) < self.low_water:
+            self.request_refill()
+        return link
+    
+    def put_back(self, channel_id, link):
+        """Return an unused link taken from the pool, to be handed out next"""
+        if not self.loaded:
+            self.load()
+        self.links.setdefault(channel_id, []).insert(0, link)
+        self.save()
+    
+    def request_refill(self):
+        """Wake the refill loop early"""
+        if self.wakeup is not None:
+            self.wakeup.set()
+    
+    async def refill(self, bot, channel_id):
+        """Create links for a channel until it reaches the target size"""
+        while self.depth(channel_id) < self.size:
+            try:
+                invite_link_object = await bot.create_chat_invite_link(
+                    chat_id=channel_id,
+                    member_limit=1,  # Limit to one use per link
+                    expire_date=None # No expiration
+                )
+            except RetryAfter as e:
+                logger.warning(f"Rate limited refilling invite pool for {channel_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                continue
+            except TelegramError as e:
+                logger.warning(f"Could not refill invite pool for {channel_id}: {e}")
+                return
+            
+            self.links.setdefault(channel_id, []).append(invite_link_object.invite_link)
+            self.created += 1
+            self.save()
+            await asyncio.sleep(INVITE_POOL_CREATE_DELAY)
+    
+    async def refill_forever(self, bot, channels, interval=INVITE_POOL_CHECK_INTERVAL):
+        """Keep every channel above the low-water mark until cancelled"""
+        self.wakeup = asyncio.Event()
+        while True:
+            for channel_id in channels:
+                if self.depth(channel_id) < self.low_water:
+                    await self.refill(bot, channel_id)
+            
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    def stats(self):
+        """Return pool depth per channel and refill counters"""
+        if not self.loaded:
+            self.load()
+        minutes = max((time.monotonic() - self.started_at) / 60, 1 / 60)
+        return {
+            'depth': {channel_id: len(links) for channel_id, links in self.links.items()},
+            'created': self.created,
+            'taken': self.taken,
+            'empty_takes': self.empty_takes,
+            'refill_per_minute': round(self.created / minutes, 2)
+        }
+
+# Shared pool for the bot process
+invite_pool = InviteLinkPool()
@@ -1,8 +1,14 @@
+import asyncio
 import json
 import logging
-import asyncio
 from telegram import Update
-from bot_lambda import bot_instance
+from bot_lambda import get_bot_instance
+from config import LAMBDA_BATCH_CONCURRENCY
+from database import db
+from lambda_runtime import LambdaRuntime, process_update_checked
+from update_dedupe import update_dedupe
+from update_processor import ordering_key
+from webhook_reply import WebhookReply
 
 # Enable logging
 logging.basicConfig(
@@ -11,10 +17,106 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# One event loop and initialized Application per container, created on the
+# first update so requests rejected early never build the bot
+runtime = None
+
+def get_runtime():
+    """Create the bot and its runtime on first use"""
+    global runtime
+    if runtime is None:
+        runtime = LambdaRuntime(get_bot_instance().application)
+    return runtime
+
+async def process_update(application, update):
+    """Process one update and wait for its database writes and admin notifications; the container may be frozen right after"""
+    await process_update_checked(application, update)
+    await flush(application)
+
+async def flush(application):
+    """Finish work left for later: nothing runs once the invocation returns"""
+    await db.flush()
+    await get_bot_instance().admin_notifier.flush(application.bot)
+
+async def process_group(application, records, semaphore):
+    """Process one user's updates in order, returns the message ids that failed and the update ids processed"""
+    failures = []
+    processed = []
+    async with semaphore:
+        for message_id, update in records:
+            if failures:
+                # Retry the rest with the failed one so they do not overtake it
+                failures.append(message_id)
+                continue
+            if not update_dedupe.begin(update.update_id):
+                continue
+            try:
+                await process_update_checked(application, update)
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+                update_dedupe.release(update.update_id)
+                failures.append(message_id)
+            else:
+                processed.append(update.update_id)
+    return failures, processed
+
+async def process_batch(application, records):
+    """Process (message_id, update) pairs concurrently across users, returns the message ids that failed"""
+    groups = {}
+    for message_id, update in records:
+        groups.setdefault(ordering_key(update), []).append((message_id, update))
+    
+    semaphore = asyncio.Semaphore(LAMBDA_BATCH_CONCURRENCY)
+    results = await asyncio.gather(*(process_group(application, group, semaphore) for group in groups.values()))
+    processed = [update_id for _, update_ids in results for update_id in update_ids]
+    try:
+        await flush(application)
+    except Exception:
+        # Nothing from this batch is known to be on disk; let every record be redelivered
+        for update_id in processed:
+            update_dedupe.release(update_id)
+        raise
+    for update_id in processed:
+        update_dedupe.done(update_id)
+    return [message_id for failures, _ in results for message_id in failures]
+
+def handle_batch(event):
+    """Process a queue event with a `Records` array, reporting partial batch failures"""
+    records = []
+    failures = []
+    bot_instance = get_bot_instance()
+    for record in event['Records']:
+        message_id = record.get('messageId')
+        try:
+            body = record['body']
+            if isinstance(body, str):
+                body = json.loads(body)
+            update = Update.de_json(body, bot_instance.application.bot)
+        except Exception as e:
+            logger.error(f"Unreadable record {message_id}: {e}")
+            failures.append(message_id)
+            continue
+        if update:
+            records.append((message_id, update))
+    
+    try:
+        failures += get_runtime().run(process_batch(bot_instance.application, records))
+    except Exception as e:
+        logger.error(f"Error processing batch: {e}", exc_info=True)
+        failures = [record.get('messageId') for record in event['Records']]
+    update_dedupe.flush()
+    
+    logger.info(f"Processed batch of {len(event['Records'])} records, {len(failures)} failed")
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
 def lambda_handler(event, context):
     """
     Main AWS Lambda handler function for Telegram webhook
     """
+    if 'Records' in event:
+        # Batched updates from a queue rather than a single webhook call
+        return handle_batch(event)
+    
     try:
         logger.info(f"Received event: {json.dumps(event)}")
         
@@ -32,30 +134,41 @@ def lambda_handler(event, context):
         
         logger.info(f"Parsed body: {json.dumps(body)}")
         
-        # Create an Update object from the webhook data
-        update = Update.de_json(body, bot_instance.application.bot)
+        # Telegram redelivers updates it did not get a 200 for; answer those
+        # before building the bot or running any handler
+        update_id = body.get('update_id')
+        if update_id is not None and not update_dedupe.begin(update_id):
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'status': 'duplicate'})
+            }
         
-        if update:
-            # Process the update using asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                loop.run_until_complete(bot_instance.application.process_update(update))
-            finally:
-                loop.close()
+        try:
+            # Create an Update object from the webhook data
+            bot_instance = get_bot_instance()
+            update = Update.de_json(body, bot_instance.application.bot)
+            reply = WebhookReply()
             
-            logger.info("Update processed successfully")
-        else:
-            logger.warning("No valid update found in request")
+            if update:
+                # Process the update on the container's event loop; a simple final
+                # reply is returned in the webhook response instead of sent separately
+                with reply:
+                    get_runtime().run(process_update(bot_instance.application, update))
+                
+                logger.info("Update processed successfully")
+            else:
+                logger.warning("No valid update found in request")
+        except Exception:
+            # Let Telegram's redelivery of this update be processed again
+            if update_id is not None:
+                update_dedupe.release(update_id)
+            raise
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({'status': 'ok'})
-        }
+        if update_id is not None:
+            update_dedupe.done(update_id)
+            update_dedupe.flush()
+        
+        return reply.response({'status': 'ok'})
         
     except Exception as e:
         logger.error(f"Error processing update: {str(e)}", exc_info=True)
@@ -1,12 +1,6 @@
 import json
 import logging
-import os
-from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-from telegram.error import TelegramError
-
-from config import *
-from database import db
+from telegram import Update
 
 # Enable logging
 logging.basicConfig(
@@ -15,11 +9,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Import the bot class from our existing bot.py
-from bot import ChannelBot
+from database import db
+from lambda_runtime import LambdaRuntime, process_update_checked
+from webhook_reply import WebhookReply
+
+# The bot instance and its runtime are created on first use
+channel_bot = None
+runtime = None
+
+def get_channel_bot():
+    """Create the bot on first use"""
+    global channel_bot
+    if channel_bot is None:
+        # Import the bot class from our existing bot.py
+        from bot import ChannelBot
+        channel_bot = ChannelBot(serverless=True)
+    return channel_bot
 
-# Initialize the bot instance
-channel_bot = ChannelBot()
+def get_runtime():
+    """Create the container's runtime on first use"""
+    global runtime
+    if runtime is None:
+        runtime = LambdaRuntime(get_channel_bot().application)
+    return runtime
 
 async def lambda_handler(event, context):
     """
@@ -30,16 +42,23 @@ async def lambda_handler(event, context):
         body = json.loads(event.get('body', '{}'))
         
         # Create an Update object from the webhook data
+        channel_bot = get_channel_bot()
         update = Update.de_json(body, channel_bot.application.bot)
+        reply = WebhookReply()
         
         if update:
-            # Process the update using the bot's application
-            await channel_bot.application.process_update(update)
+            # Process the update using the bot's application; a simple final
+            # reply is returned in the webhook response instead of sent separately
+            with reply:
+                await process_update_checked(channel_bot.application, update)
             
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'status': 'ok'})
-        }
+            # The container may be frozen right after returning, so do not
+            # leave writes to the background writer or admin notifications
+            # to post_init's flush task, which never runs here
+            await db.flush()
+            await channel_bot.admin_notifier.flush(channel_bot.application.bot)
+            
+        return reply.response({'status': 'ok'})
         
     except Exception as e:
         logger.error(f"Error processing update: {e}")
@@ -52,16 +71,5 @@ def handler(event, context):
     """
     Synchronous wrapper for the async lambda_handler
     """
-    import asyncio
-    
-    # Create a new event loop for this invocation
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    try:
-        # Run the async handler
-        result = loop.run_until_complete(lambda_handler(event, context))
-        return result
-    finally:
-        loop.close()
-
+    # Run on the container's event loop, kept alive across warm invocations
+    return get_runtime().run(lambda_handler(event, context))
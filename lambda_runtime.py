@@ -0,0 +1,98 @@
+import asyncio
+import atexit
+import contextvars
+import logging
+import signal
+
+from config import LAMBDA_REUSE_EVENT_LOOP
+
+logger = logging.getLogger(__name__)
+
+# Exceptions raised by handlers for the update being processed. PTB passes
+# them to error handlers instead of raising them from process_update.
+handler_errors = contextvars.ContextVar('handler_errors', default=None)
+
+async def record_handler_error(update, context):
+    """Error handler: remember the exception for process_update_checked"""
+    logger.error(f"Error handling update: {context.error}", exc_info=context.error)
+    errors = handler_errors.get()
+    if errors is not None:
+        errors.append(context.error)
+
+async def process_update_checked(application, update):
+    """Process one update, raising the first exception any of its handlers raised"""
+    errors = []
+    token = handler_errors.set(errors)
+    try:
+        await application.process_update(update)
+    finally:
+        handler_errors.reset(token)
+    if errors:
+        raise errors[0]
+
+class LambdaRuntime:
+    """Runs coroutines for Lambda invocations on one event loop per container"""
+    
+    def __init__(self, application, reuse_loop=LAMBDA_REUSE_EVENT_LOOP):
+        self.application = application
+        # Blocking error handlers run in the update's own task, so a failed
+        # update can be reported back to Lambda instead of counted as done
+        application.add_error_handler(record_handler_error)
+        self.reuse_loop = reuse_loop
+        self.loop = None
+        self.initialized = False
+    
+    def get_loop(self):
+        """Return the container's event loop, creating it on the first invocation"""
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            atexit.register(self.shutdown)
+            # Lambda sends SIGTERM before freezing a container for good
+            # (when an extension is registered); close connections cleanly then.
+            try:
+                signal.signal(signal.SIGTERM, self.handle_sigterm)
+            except ValueError:
+                # Not in the main thread (e.g. local tests), rely on atexit
+                pass
+        return self.loop
+    
+    def run(self, coro):
+        """Run a coroutine for one invocation"""
+        if not self.reuse_loop:
+            # A fresh loop and Application lifecycle per invocation
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.application.initialize())
+                return loop.run_until_complete(coro)
+            finally:
+                try:
+                    loop.run_until_complete(self.application.shutdown())
+                finally:
+                    loop.close()
+        
+        loop = self.get_loop()
+        if not self.initialized:
+            loop.run_until_complete(self.application.initialize())
+            self.initialized = True
+            logger.info("Application initialized, reusing it for warm invocations")
+        return loop.run_until_complete(coro)
+    
+    def shutdown(self):
+        """Shut the Application down and close the loop"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        try:
+            if self.initialized:
+                self.loop.run_until_complete(self.application.shutdown())
+                self.initialized = False
+        except Exception as e:
+            logger.error(f"Error shutting down application: {e}")
+        finally:
+            self.loop.close()
+    
+    def handle_sigterm(self, signum, frame):
+        logger.info("Received SIGTERM, shutting down")
+        self.shutdown()
+        raise SystemExit(0)
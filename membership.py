@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from telegram.error import TelegramError
+
+from config import (
+    MEMBERSHIP_CHECK_CONCURRENCY, MEMBERSHIP_CHECK_TIMEOUT,
+    MEMBERSHIP_CACHE_POSITIVE_TTL, MEMBERSHIP_CACHE_NEGATIVE_TTL, MEMBERSHIP_CACHE_SIZE,
+    MEMBERSHIP_INDEX_FILE
+)
+
+logger = logging.getLogger(__name__)
+
+class MembershipCache:
+    """LRU cache of (user_id, channel_id) membership verdicts with separate TTLs for joined and not joined"""
+    
+    def __init__(self, positive_ttl=MEMBERSHIP_CACHE_POSITIVE_TTL, negative_ttl=MEMBERSHIP_CACHE_NEGATIVE_TTL,
+                 max_size=MEMBERSHIP_CACHE_SIZE):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id, channel_id):
+        """Return the cached verdict, or None if missing or expired"""
+        key = (user_id, channel_id)
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def set(self, user_id, channel_id, joined):
+        """Store a verdict, evicting the least recently used entries when full"""
+        ttl = self.positive_ttl if joined else self.negative_ttl
+        key = (user_id, channel_id)
+        self.entries[key] = (joined, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, user_id, channel_id=None):
+        """Drop cached verdicts for a user, optionally for one channel only"""
+        if channel_id is not None:
+            self.entries.pop((user_id, channel_id), None)
+            return
+        for key in [key for key in self.entries if key[0] == user_id]:
+            del self.entries[key]
+    
+    def stats(self):
+        """Return cache counters"""
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class MembershipIndex:
+    """Persistent record of who is in each channel, fed by chat_member updates"""
+    
+    def __init__(self, path=MEMBERSHIP_INDEX_FILE):
+        self.path = path
+        self.channels = {}
+        self.log_records = 0
+        self.loaded = False
+    
+    def load(self):
+        """Replay the index log"""
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        channel_id, user_id, joined = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.channels.setdefault(channel_id, {})[user_id] = joined
+                    self.log_records += 1
+        except Exception as e:
+            logger.error(f"Error loading membership index: {e}")
+    
+    def size(self):
+        """Return the number of indexed (channel, user) pairs"""
+        if not self.loaded:
+            self.load()
+        return sum(len(members) for members in self.channels.values())
+    
+    def get(self, user_id, channel_id):
+        """Return True/False if the user is known to be in/out of the channel, None if never seen"""
+        if not self.loaded:
+            self.load()
+        return self.channels.get(channel_id, {}).get(user_id)
+    
+    def set(self, user_id, channel_id, joined):
+        """Record a membership change, appending it to the log"""
+        if not self.loaded:
+            self.load()
+        members = self.channels.setdefault(channel_id, {})
+        if members.get(user_id) == joined:
+            return
+        members[user_id] = joined
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps([channel_id, user_id, joined]) + '\n')
+            self.log_records += 1
+        except Exception as e:
+            logger.error(f"Error writing membership index: {e}")
+        
+        if self.log_records > max(1000, 2 * self.size()):
+            self.compact()
+    
+    def compact(self):
+        """Rewrite the log with one record per indexed pair"""
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                for channel_id, members in self.channels.items():
+                    for user_id, joined in members.items():
+                        f.write(json.dumps([channel_id, user_id, joined]) + '\n')
+            os.replace(tmp_path, self.path)
+            self.log_records = self.size()
+        except Exception as e:
+            logger.error(f"Error compacting membership index: {e}")
+
+async def is_member(bot, channel_id, user_id, timeout=MEMBERSHIP_CHECK_TIMEOUT):
+    """Check membership in a single channel, returning None if it could not be determined"""
+    try:
+        member = await asyncio.wait_for(bot.get_chat_member(channel_id, user_id), timeout)
+        return member.status not in ["left", "kicked"]
+    except asyncio.TimeoutError:
+        logger.warning(f"Membership check for {channel_id} timed out after {timeout}s")
+        return None
+    except TelegramError as e:
+        logger.warning(f"Could not check membership for {channel_id}: {e}")
+        return None
+
+async def get_missing_channels(bot, user_id, channels, cache=None, index=None,
+                               concurrency=MEMBERSHIP_CHECK_CONCURRENCY, timeout=MEMBERSHIP_CHECK_TIMEOUT):
+    """Return the channels the user has not joined, checking the ones not known as joined or cached concurrently"""
+    verdicts = {}
+    for channel_id in channels:
+        # Only a recorded join is trusted: a leave may be followed by a join
+        # the bot never heard about (missed updates, or a webhook registered
+        # without chat_member), so "not joined" is always re-checked.
+        if index is not None and index.get(user_id, channel_id):
+            verdicts[channel_id] = True
+        if verdicts.get(channel_id) is None and cache is not None:
+            verdicts[channel_id] = cache.get(user_id, channel_id)
+    
+    to_check = [channel_id for channel_id in channels if verdicts.get(channel_id) is None]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def check(channel_id):
+        async with semaphore:
+            return await is_member(bot, channel_id, user_id, timeout)
+    
+    results = await asyncio.gather(*[check(channel_id) for channel_id in to_check])
+    for channel_id, joined in zip(to_check, results):
+        verdicts[channel_id] = joined
+        # Errors are not verdicts, so they are never cached
+        if joined is None:
+            continue
+        if cache is not None:
+            cache.set(user_id, channel_id, joined)
+    
+    # If bot can't check (e.g., not admin in channel, or invalid link),
+    # assume user hasn't joined for safety.
+    return [channel_id for channel_id in channels if not verdicts[channel_id]]
+
+# Shared cache and index for the bot process
+membership_cache = MembershipCache()
+membership_index = MembershipIndex()
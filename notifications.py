@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest, TelegramError
+
+from config import ADMIN_IDS, ADMIN_DIGEST_INTERVAL, ADMIN_DIGEST_MAX_EVENTS, ADMIN_DIGEST_LIVE_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+class AdminNotifier:
+    """Batches new link request notifications into one digest per admin"""
+    
+    def __init__(self, admin_ids=ADMIN_IDS, interval=ADMIN_DIGEST_INTERVAL, max_events=ADMIN_DIGEST_MAX_EVENTS,
+                 live_message=ADMIN_DIGEST_LIVE_MESSAGE, pending_count=None):
+        self.admin_ids = admin_ids
+        self.interval = interval
+        self.max_events = max_events
+        self.live_message = live_message
+        self.pending_count = pending_count
+        self.events = []
+        self.last_flush = 0
+        self.live_message_ids = {}
+        self.lock = asyncio.Lock()
+    
+    async def notify(self, bot, request_id, user_id, username):
+        """Queue a new request event, sending a digest right away if one is due"""
+        self.events.append((request_id, user_id, username))
+        if len(self.events) >= self.max_events or time.monotonic() - self.last_flush >= self.interval:
+            await self.flush(bot)
+    
+    async def flush(self, bot):
+        """Send queued events to every admin"""
+        async with self.lock:
+            if not self.events:
+                return
+            events, self.events = self.events, []
+            self.last_flush = time.monotonic()
+            if self.live_message:
+                text = self.build_live_text(events)
+                await asyncio.gather(*[self.update_live_message(bot, admin_id, text) for admin_id in self.admin_ids])
+            else:
+                text = self.build_digest_text(events)
+                await asyncio.gather(*[self.send(bot, admin_id, text) for admin_id in self.admin_ids])
+    
+    async def flush_forever(self, bot):
+        """Send whatever is left in the queue every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(bot)
+            except Exception as e:
+                logger.error(f"Error flushing admin notifications: {e}")
+    
+    def build_digest_text(self, events):
+        """Text listing each queued request"""
+        if len(events) == 1:
+            request_id, user_id, username = events[0]
+            return f"🔔 New link request {self.describe(request_id)}from @{username}\nUse /pending to review."
+        
+        text = f"🔔 {len(events)} new link requests:\n"
+        for request_id, user_id, username in events:
+            text += f"• {self.describe(request_id)}from @{username} (ID: {user_id})\n"
+        return text + "Use /pending to review."
+    
+    def build_live_text(self, events):
+        """Text for the single in-place "N pending" message"""
+        latest = events[-1]
+        text = f"🔔 {len(events)} new link request(s) since the last update, latest from @{latest[2]}\n"
+        if self.pending_count is not None:
+            text = f"📋 {self.pending_count()} pending link requests\n" + text
+        return text + f"Updated {time.strftime('%H:%M:%S')}. Use /pending to review."
+    
+    @staticmethod
+    def describe(request_id):
+        """Request number prefix, if known"""
+        return f"#{request_id} " if request_id is not None else ""
+    
+    async def send(self, bot, admin_id, text):
+        """Send a message to one admin"""
+        try:
+            return await bot.send_message(admin_id, text)
+        except TelegramError as e:
+            logger.error(f"Failed to notify admin {admin_id}: {e}")
+            return None
+    
+    async def update_live_message(self, bot, admin_id, text):
+        """Edit the admin's live message, sending a new one if there is none yet"""
+        message_id = self.live_message_ids.get(admin_id)
+        if message_id is not None:
+            try:
+                await bot.edit_message_text(text, chat_id=admin_id, message_id=message_id)
+                return
+            except BadRequest as e:
+                # Deleted or too old to edit, fall through and start a new one
+                logger.info(f"Could not edit live notification for admin {admin_id}: {e}")
+            except TelegramError as e:
+                logger.error(f"Failed to notify admin {admin_id}: {e}")
+                return
+        
+        message = await self.send(bot, admin_id, text)
+        if message is not None:
+            self.live_message_ids[admin_id] = message.message_id
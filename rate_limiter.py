@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    ADMIN_IDS, RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_PRIVATE_CHAT_PER_SECOND,
+    RATE_LIMIT_PRIVATE_CHAT_BURST, RATE_LIMIT_GROUP_CHAT_PER_MINUTE, RATE_LIMIT_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first. Pass e.g. rate_limit_args={'priority': PRIORITY_BULK}
+# to any bot method; admin chats default to PRIORITY_HIGH, everything else to PRIORITY_NORMAL.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Serializes waiters so requests to one chat keep their order
+        self.lock = asyncio.Lock()
+    
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self):
+        """Seconds until a token is available"""
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self):
+        self.tokens -= 1
+    
+    def is_full(self):
+        self.refill()
+        return self.tokens >= self.capacity
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Throttles outgoing messages with a global and per-chat token buckets, priority lanes and RetryAfter backoff"""
+    
+    # Endpoints that count towards Telegram's message limits. Everything else
+    # (getChatMember, answerCallbackQuery, ...) only gets RetryAfter handling.
+    MESSAGE_ENDPOINT_PREFIXES = ('send', 'edit', 'copy', 'forward')
+    MAX_CHAT_BUCKETS = 10000
+    
+    def __init__(self, global_per_second=RATE_LIMIT_GLOBAL_PER_SECOND, max_retries=RATE_LIMIT_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self.chat_buckets = {}
+        self.max_retries = max_retries
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.paused_until = 0
+        self.retries = 0
+        self.sent = {PRIORITY_HIGH: 0, PRIORITY_NORMAL: 0, PRIORITY_BULK: 0}
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    def chat_bucket(self, chat_id):
+        """Per-chat bucket, created on demand; idle buckets are dropped when there are too many"""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self.chat_buckets = {
+                    key: value for key, value in self.chat_buckets.items()
+                    if not value.is_full() or value.lock.locked()
+                }
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(RATE_LIMIT_GROUP_CHAT_PER_MINUTE / 60, RATE_LIMIT_GROUP_CHAT_PER_MINUTE)
+            else:
+                bucket = TokenBucket(RATE_LIMIT_PRIVATE_CHAT_PER_SECOND, RATE_LIMIT_PRIVATE_CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+    
+    async def wait_for_chat(self, chat_id):
+        """Wait until the chat's bucket has a token and take it"""
+        bucket = self.chat_bucket(chat_id)
+        async with bucket.lock:
+            while (delay := bucket.delay()) > 0:
+                await asyncio.sleep(delay)
+            bucket.consume()
+    
+    async def wait_for_global(self, priority):
+        """Wait for a global token; the highest-priority, oldest waiter is always served first"""
+        entry = (priority, next(self.sequence), asyncio.Event())
+        heapq.heappush(self.waiters, entry)
+        try:
+            while True:
+                if self.waiters[0] is entry:
+                    delay = max(self.global_bucket.delay(), self.paused_until - time.monotonic())
+                    if delay <= 0:
+                        self.global_bucket.consume()
+                        return
+                    # Recheck after sleeping in case a higher-priority request arrived meanwhile
+                    await asyncio.sleep(delay)
+                else:
+                    await entry[2].wait()
+                    entry[2].clear()
+        finally:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+            # Hand the turn to the next waiter
+            if self.waiters:
+                self.waiters[0][2].set()
+    
+    def priority_for(self, data, rate_limit_args):
+        if rate_limit_args and 'priority' in rate_limit_args:
+            return rate_limit_args['priority']
+        if data.get('chat_id') in ADMIN_IDS:
+            return PRIORITY_HIGH
+        return PRIORITY_NORMAL
+    
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        is_message = endpoint.startswith(self.MESSAGE_ENDPOINT_PREFIXES)
+        priority = self.priority_for(data, rate_limit_args)
+        chat_id = data.get('chat_id')
+        
+        for attempt in range(self.max_retries + 1):
+            if is_message:
+                if chat_id is not None:
+                    await self.wait_for_chat(chat_id)
+                await self.wait_for_global(priority)
+            else:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+            
+            try:
+                result = await callback(*args, **kwargs)
+                if is_message:
+                    self.sent[priority] = self.sent.get(priority, 0) + 1
+                return result
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                logger.warning(f"Hit flood limit on {endpoint}, pausing outbound requests for {retry_after}s")
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                await asyncio.sleep(retry_after)
+    
+    def stats(self):
+        """Return queue depth, send counts per lane and retry count"""
+        return {
+            'waiting': len(self.waiters),
+            'sent': dict(self.sent),
+            'retries': self.retries,
+            'chat_buckets': len(self.chat_buckets)
+        }
@@ -0,0 +1,19 @@
+import asyncio
+import sys
+from config import DATABASE_MAX_SHARDS
+from database import Database
+
+async def main(count):
+    database = Database()
+    before = len(database.shards)
+    if await database.reshard(count):
+        print(f"✅ Moved {database.count_users()} users from {before} into {count} shards")
+    else:
+        print(f"✅ Users are already in {count} shards")
+    database.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit() or not 1 <= int(sys.argv[1]) <= DATABASE_MAX_SHARDS:
+        print(f"Usage: python reshard.py <count>, count from 1 to {DATABASE_MAX_SHARDS}")
+        sys.exit(1)
+    asyncio.run(main(int(sys.argv[1])))
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Snapshot file layout:
+#   header     one JSON line, padded to HEADER_SIZE bytes
+#   links      one JSON line with the link request lists
+#   users      one JSON line per user: [user_id, username, first_name, joined_at, last_check]
+#   index      one INDEX_ENTRY per user, sorted by user id
+# Opening a snapshot maps the file and reads only the header and the links,
+# so startup does not depend on the number of users; a user's line is
+# found by binary search over the index and decoded when first needed.
+FORMAT = 2
+HEADER_SIZE = 512
+INDEX_ENTRY = struct.Struct('<qQII')  # user id, line offset, crc32 of line and flags, flags
+
+def loads(data):
+    """Decode JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(value):
+    """Encode compact JSON to bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+def record_crc(line, flags):
+    return zlib.crc32(struct.pack('<I', flags), zlib.crc32(line))
+
+def fsync_directory(path):
+    """Make a rename in the directory of path durable"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # Not supported on this platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class SnapshotWriter:
+    """Writes a snapshot one user at a time; commit() makes it the current generation"""
+    
+    # Users must be added in ascending id order, line being the encoded
+    # record without its newline
+    
+    def __init__(self, path, previous_path, links):
+        self.path = path
+        self.previous_path = previous_path
+        self.tmp_path = path + '.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(b' ' * (HEADER_SIZE - 1) + b'\n')
+        self.links_line = dumps(links) + b'\n'
+        self.file.write(self.links_line)
+        self.index = bytearray()
+        self.offset = self.users_offset = HEADER_SIZE + len(self.links_line)
+        self.count = 0
+    
+    def add(self, user_id, line, flags):
+        """Append one user's record"""
+        self.index += INDEX_ENTRY.pack(user_id, self.offset, record_crc(line, flags), flags)
+        self.file.write(line + b'\n')
+        self.offset += len(line) + 1
+        self.count += 1
+    
+    def commit(self, seq):
+        """Finish the file and atomically replace the snapshot at path, keeping the old one as previous_path"""
+        f = self.file
+        f.write(self.index)
+        header = json.dumps({
+            'format': FORMAT,
+            'seq': seq,
+            'users': self.count,
+            'links_offset': HEADER_SIZE,
+            'users_offset': self.users_offset,
+            'index_offset': self.offset,
+            'checksum': hashlib.sha256(self.links_line).hexdigest()
+        }).encode()
+        f.seek(0)
+        f.write(header.ljust(HEADER_SIZE - 1) + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        self.file = None
+        
+        if os.path.exists(self.path):
+            os.replace(self.path, self.previous_path)
+        os.replace(self.tmp_path, self.path)
+        fsync_directory(self.path)
+    
+    def abort(self):
+        """Drop an unfinished file"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.tmp_path)
+
+def write_snapshot(path, previous_path, links, users, seq):
+    """Atomically replace the snapshot at path, keeping the old one as previous_path"""
+    # users yields (user_id, line, flags) in ascending id order
+    writer = SnapshotWriter(path, previous_path, links)
+    try:
+        for user_id, line, flags in users:
+            writer.add(user_id, line, flags)
+        writer.commit(seq)
+    except BaseException:
+        writer.abort()
+        raise
+
+def is_snapshot_file(path):
+    """Whether path starts with a format 2 header"""
+    with open(path, 'rb') as f:
+        first_line = f.readline(HEADER_SIZE)
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get('format') == FORMAT
+
+class SnapshotFile:
+    """A memory-mapped snapshot whose user records are decoded on demand"""
+    
+    # The map stays valid after the file is renamed to the previous
+    # generation or replaced (POSIX keeps the inode alive while mapped).
+    
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = json.loads(self.map[:HEADER_SIZE])
+            links_line = self.map[self.header['links_offset']:self.header['users_offset']]
+            if hashlib.sha256(links_line).hexdigest() != self.header['checksum']:
+                raise ValueError(f"checksum mismatch in {path}")
+            self.count = self.header['users']
+            self.index_offset = self.header['index_offset']
+            if len(self.map) != self.index_offset + self.count * INDEX_ENTRY.size:
+                raise ValueError(f"{path} is truncated")
+            self.links = loads(links_line)
+        except Exception:
+            self.map.close()
+            raise
+    
+    def entry(self, position):
+        """(user_id, offset, crc, flags) of the index entry at position"""
+        return INDEX_ENTRY.unpack_from(self.map, self.index_offset + position * INDEX_ENTRY.size)
+    
+    def find(self, user_id):
+        """Index position of a user, or -1"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_id = INDEX_ENTRY.unpack_from(self.map, self.index_offset + middle * INDEX_ENTRY.size)[0]
+            if middle_id < user_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.entry(low)[0] == user_id:
+            return low
+        return -1
+    
+    def line(self, offset):
+        """The record line starting at offset, without its newline"""
+        return self.map[offset:self.map.find(b'\n', offset)]
+    
+    def record(self, user_id):
+        """(fields, flags) for a user, None if absent; raises ValueError if the record is damaged"""
+        position = self.find(user_id)
+        if position < 0:
+            return None
+        _, offset, crc, flags = self.entry(position)
+        line = self.line(offset)
+        if record_crc(line, flags) != crc:
+            raise ValueError(f"checksum mismatch for user {user_id} in {self.path}")
+        fields = loads(line)
+        if fields[0] != user_id:
+            raise ValueError(f"index points at the wrong record for user {user_id} in {self.path}")
+        return fields, flags
+    
+    def entries(self):
+        """(user_id, offset, crc, flags) for every user in id order"""
+        return INDEX_ENTRY.iter_unpack(self.map[self.index_offset:])
+    
+    def close(self):
+        self.map.close()
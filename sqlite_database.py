@@ -0,0 +1,255 @@
+import os
+import sqlite3
+from datetime import datetime
+from config import DATABASE_FILE, DATABASE_JOURNAL_FILE, SQLITE_DATABASE_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    joined_at TEXT NOT NULL,
+    has_access INTEGER NOT NULL DEFAULT 0,
+    last_check TEXT,
+    blocked INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS link_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    link_type TEXT,
+    description TEXT,
+    requested_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    approved_by INTEGER,
+    approved_at TEXT,
+    private_link TEXT,
+    rejected_by INTEGER,
+    rejected_at TEXT,
+    rejection_reason TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_link_requests_status ON link_requests (status, id);
+CREATE INDEX IF NOT EXISTS idx_link_requests_user ON link_requests (user_id);
+"""
+
+class SQLiteDatabase:
+    """SQLite storage with the same interface as database.Database"""
+    
+    def __init__(self, path=SQLITE_DATABASE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.upgrade_schema()
+    
+    def upgrade_schema(self):
+        """Add columns introduced after a database file was created"""
+        columns = [row['name'] for row in self.conn.execute("PRAGMA table_info(users)")]
+        if 'blocked' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE users ADD COLUMN blocked INTEGER NOT NULL DEFAULT 0")
+    
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+    
+    async def flush(self):
+        """Every change is committed as it is made, nothing to wait for"""
+    
+    def request_to_dict(self, row):
+        """Convert a link_requests row to the dict shape used by the JSON backend"""
+        if row is None:
+            return None
+        return {key: row[key] for key in row.keys() if row[key] is not None}
+    
+    def add_user(self, user_id, username=None, first_name=None):
+        """Add or update user in database"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO users (user_id, username, first_name, joined_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, first_name = excluded.first_name, "
+                "blocked = 0 "
+                "WHERE username IS NOT excluded.username OR first_name IS NOT excluded.first_name OR blocked = 1",
+                (int(user_id), username, first_name, datetime.now().isoformat())
+            )
+    
+    def grant_access(self, user_id):
+        """Grant access to user"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE users SET has_access = 1, last_check = ? WHERE user_id = ?",
+                (datetime.now().isoformat(), int(user_id))
+            )
+    
+    def revoke_access(self, user_id):
+        """Revoke access from user"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE users SET has_access = 0, last_check = ? WHERE user_id = ? AND has_access = 1",
+                (datetime.now().isoformat(), int(user_id))
+            )
+    
+    def has_access(self, user_id):
+        """Check if user has access"""
+        row = self.conn.execute("SELECT has_access FROM users WHERE user_id = ?", (int(user_id),)).fetchone()
+        return bool(row and row['has_access'])
+    
+    def get_user(self, user_id):
+        """Get user data"""
+        row = self.conn.execute(
+            "SELECT username, first_name, joined_at, has_access, last_check FROM users WHERE user_id = ?",
+            (int(user_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        user['has_access'] = bool(user['has_access'])
+        return user
+    
+    def mark_blocked(self, user_id):
+        """Mark a user who blocked the bot or deleted their account"""
+        with self.conn:
+            self.conn.execute("UPDATE users SET blocked = 1 WHERE user_id = ?", (int(user_id),))
+    
+    def count_users(self, include_blocked=True):
+        """Get the number of users"""
+        if include_blocked:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM users WHERE blocked = 0").fetchone()[0]
+    
+    def iter_user_ids(self, after_id=None, batch_size=1000):
+        """Yield batches of reachable user ids in ascending order, starting after a cursor id"""
+        cursor = after_id if after_id is not None else -1
+        while True:
+            rows = self.conn.execute(
+                "SELECT user_id FROM users WHERE user_id > ? AND blocked = 0 ORDER BY user_id LIMIT ?",
+                (cursor, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            batch = [row['user_id'] for row in rows]
+            yield batch
+            cursor = batch[-1]
+    
+    def add_pending_link(self, user_id, username, link_type, description):
+        """Add pending link request"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO link_requests (user_id, username, link_type, description, requested_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, username, link_type, description, datetime.now().isoformat())
+            )
+        return cursor.lastrowid
+    
+    def get_pending_links(self):
+        """Get all pending link requests"""
+        rows = self.conn.execute("SELECT * FROM link_requests WHERE status = 'pending' ORDER BY id")
+        return [self.request_to_dict(row) for row in rows]
+    
+    def count_pending_links(self):
+        """Get the number of pending link requests"""
+        return self.conn.execute("SELECT COUNT(*) FROM link_requests WHERE status = 'pending'").fetchone()[0]
+    
+    def get_pending_links_page(self, after_id=None, before_id=None, limit=10):
+        """Get a page of pending link requests, returns (requests, has_prev, has_next)"""
+        if before_id is not None:
+            rows = self.conn.execute(
+                "SELECT * FROM link_requests WHERE status = 'pending' AND id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit)
+            ).fetchall()
+            rows.reverse()
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM link_requests WHERE status = 'pending' AND id > ? ORDER BY id LIMIT ?",
+                (after_id or 0, limit)
+            ).fetchall()
+        if not rows:
+            return [], False, False
+        
+        exists = "SELECT EXISTS (SELECT 1 FROM link_requests WHERE status = 'pending' AND id {} ?)"
+        has_prev = bool(self.conn.execute(exists.format('<'), (rows[0]['id'],)).fetchone()[0])
+        has_next = bool(self.conn.execute(exists.format('>'), (rows[-1]['id'],)).fetchone()[0])
+        return [self.request_to_dict(row) for row in rows], has_prev, has_next
+    
+    def get_pending_link(self, request_id):
+        """Get a link request by id if it is still pending"""
+        row = self.conn.execute(
+            "SELECT * FROM link_requests WHERE id = ? AND status = 'pending'", (request_id,)
+        ).fetchone()
+        return self.request_to_dict(row)
+    
+    def get_user_link_requests(self, user_id):
+        """Get all link requests made by a user"""
+        rows = self.conn.execute("SELECT * FROM link_requests WHERE user_id = ? ORDER BY id", (user_id,))
+        return [self.request_to_dict(row) for row in rows]
+    
+    def get_link_request(self, request_id):
+        """Get a link request by id, whatever its status"""
+        row = self.conn.execute("SELECT * FROM link_requests WHERE id = ?", (request_id,)).fetchone()
+        return self.request_to_dict(row)
+    
+    def approve_link(self, request_id, admin_id, private_link):
+        """Approve a link request"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE link_requests SET status = 'approved', approved_by = ?, approved_at = ?, private_link = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (admin_id, datetime.now().isoformat(), private_link, request_id)
+            )
+        return cursor.rowcount == 1
+    
+    def reject_link(self, request_id, admin_id, reason=None):
+        """Reject a link request"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE link_requests SET status = 'rejected', rejected_by = ?, rejected_at = ?, rejection_reason = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (admin_id, datetime.now().isoformat(), reason, request_id)
+            )
+        return cursor.rowcount == 1
+    
+    def migrate_from_json(self, data):
+        """Import users and link requests exported from the JSON database"""
+        users = [
+            (int(user_id), user.get('username'), user.get('first_name'),
+             user.get('joined_at') or datetime.now().isoformat(),
+             int(bool(user.get('has_access'))), user.get('last_check'), int(bool(user.get('blocked'))))
+            for user_id, user in data.get('users', {}).items()
+        ]
+        
+        requests = [
+            (req['id'], req['user_id'], req.get('username'), req.get('link_type'), req.get('description'),
+             req.get('requested_at') or datetime.now().isoformat(), req.get('status', 'pending'),
+             req.get('approved_by'), req.get('approved_at'), req.get('private_link'),
+             req.get('rejected_by'), req.get('rejected_at'), req.get('rejection_reason'))
+            for req in data.get('pending_links', [])
+        ]
+        
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users (user_id, username, first_name, joined_at, has_access, last_check, blocked) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                users
+            )
+            # approved_links only holds copies of approved pending_links entries,
+            # so the status column carries that information here.
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO link_requests (id, user_id, username, link_type, description, requested_at, "
+                "status, approved_by, approved_at, private_link, rejected_by, rejected_at, rejection_reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                requests
+            )
+        return len(users), len(requests)
+
+if __name__ == "__main__":
+    if not os.path.exists(DATABASE_FILE) and not os.path.exists(DATABASE_JOURNAL_FILE):
+        print(f"❌ {DATABASE_FILE} not found, nothing to migrate.")
+    else:
+        # Journals are replayed on load, so the export includes every change
+        from database import Database
+        users, requests = SQLiteDatabase().migrate_from_json(Database().export())
+        print(f"✅ Migrated {users} users and {requests} link requests into {SQLITE_DATABASE_FILE}")
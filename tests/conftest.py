@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py needs these at import time; tests never talk to Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:test')
+os.environ.setdefault('OWNER_ID', '1')
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, where the database keeps its files"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
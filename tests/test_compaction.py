@@ -0,0 +1,37 @@
+import os
+
+from database import Database
+from config import DATABASE_FILE, DATABASE_PREVIOUS_FILE
+
+def reopen(db):
+    db.close()
+    return Database()
+
+def test_compaction_truncates_journals(workdir):
+    db = Database()
+    for user_id in range(20):
+        db.add_user(user_id, f'user{user_id}', 'Name')
+    db.compact()
+    assert all(os.path.getsize(shard.journal_path) == 0 for shard in db.shards)
+    db.grant_access(5)
+    db = reopen(db)
+    assert db.count_users() == 20
+    assert db.has_access(5) and not db.has_access(6)
+    db.close()
+
+def test_damaged_snapshot_falls_back_to_previous_generation(workdir):
+    db = Database()
+    db.add_pending_link(10, 'alice', 'Private Channel Access', 'first')
+    db.compact()
+    db.add_pending_link(11, 'bob', 'Private Channel Access', 'second')
+    db.compact()
+    db.close()
+    assert os.path.exists(DATABASE_PREVIOUS_FILE)
+    with open(DATABASE_FILE, 'r+b') as f:
+        f.seek(600)
+        f.write(b'garbage')
+    
+    db = Database()
+    assert [req['description'] for req in db.get_pending_links()] == ['first']
+    assert os.path.exists(DATABASE_FILE + '.corrupt')
+    db.close()
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from database import Database
+
+def reopen(db):
+    db.close()
+    return Database()
+
+def test_changes_survive_restart(workdir):
+    db = Database()
+    db.add_user(10, 'alice', 'Alice')
+    db.grant_access(10)
+    request_id = db.add_pending_link(10, 'alice', 'Private Channel Access', 'test')
+    db = reopen(db)
+    assert db.get_user(10)['username'] == 'alice'
+    assert db.has_access(10)
+    assert db.get_pending_link(request_id)['user_id'] == 10
+    db.close()
+
+def test_flush_raises_when_a_write_fails(workdir):
+    db = Database()
+    db.add_user(10, 'alice', 'Alice')
+    shard = db.shard_for(10)
+    journal_path, shard.journal_path = shard.journal_path, str(workdir / 'missing' / 'users.journal')
+    with pytest.raises(OSError):
+        asyncio.run(db.flush())
+    
+    # The change stays queued and goes out with the next flush
+    shard.journal_path = journal_path
+    asyncio.run(db.flush())
+    db = reopen(db)
+    assert db.get_user(10)['username'] == 'alice'
+    db.close()
+
+def test_torn_journal_line_does_not_swallow_next_record(workdir):
+    db = Database()
+    db.add_user(10, 'alice', 'Alice')
+    journal_path = db.shard_for(11).journal_path
+    db.close()
+    # A crash in the middle of an append
+    with open(journal_path, 'a') as f:
+        f.write('{"op":"grant_acc')
+    
+    db = Database()
+    db.add_user(11, 'bob', 'Bob')
+    db = reopen(db)
+    assert db.get_user(11)['username'] == 'bob'
+    assert db.get_user(10)['username'] == 'alice'
+    db.close()
+    with open(journal_path) as f:
+        assert all(json.loads(line) for line in f)
+
+def test_torn_link_journal_line(workdir):
+    db = Database()
+    db.close()
+    with open(db.journal_path, 'a') as f:
+        f.write('{"op":"add_pending')
+    db = Database()
+    request_id = db.add_pending_link(10, 'alice', 'Private Channel Access', 'test')
+    db = reopen(db)
+    assert db.get_pending_link(request_id) is not None
+    db.close()
@@ -0,0 +1,12 @@
+from invite_pool import InviteLinkPool
+
+def test_put_back_link_is_handed_out_next(workdir):
+    pool = InviteLinkPool(path='pool.json')
+    pool.links = {-1: ['a', 'b']}
+    pool.loaded = True
+    assert pool.take(-1) == 'a'
+    pool.put_back(-1, 'a')
+    
+    reloaded = InviteLinkPool(path='pool.json')
+    assert reloaded.depth(-1) == 2
+    assert reloaded.take(-1) == 'a'
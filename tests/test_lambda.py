@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler
+from telegram.request import HTTPXRequest
+
+import lambda_function
+from lambda_runtime import LambdaRuntime
+from notifications import AdminNotifier
+from update_dedupe import UpdateDedupeStore
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.edited = []
+    
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+    
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edited.append((chat_id, message_id, text))
+
+class FakeApplication:
+    """Every update is a new link request"""
+    
+    def __init__(self, notifier):
+        self.bot = FakeBot()
+        self.notifier = notifier
+    
+    async def process_update(self, update):
+        await self.notifier.notify(self.bot, update.update_id, update.update_id, 'user')
+
+def test_buffered_admin_notifications_go_out_before_the_invocation_returns(workdir, monkeypatch):
+    # The first request of an interval is sent at once; the rest are buffered
+    notifier = AdminNotifier(admin_ids=[1], interval=3600)
+    application = FakeApplication(notifier)
+    monkeypatch.setattr(lambda_function, 'get_bot_instance', lambda: SimpleNamespace(admin_notifier=notifier))
+    
+    async def run():
+        await lambda_function.process_update(application, SimpleNamespace(update_id=1))
+        await lambda_function.process_update(application, SimpleNamespace(update_id=2))
+        records = [(str(i), SimpleNamespace(update_id=i, effective_user=None, effective_chat=None)) for i in (3, 4)]
+        assert await lambda_function.process_batch(application, records) == []
+    asyncio.run(run())
+    
+    assert not notifier.events
+    assert len(application.bot.sent) == 3
+    assert '2 new link requests' in application.bot.sent[-1][1]
+
+def make_update(update_id, user_id, text):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        }
+    }
+
+def test_lambda_admin_notifications_edit_one_message(workdir, monkeypatch):
+    from bot_lambda import ChannelBotLambda
+    notifier = ChannelBotLambda().admin_notifier
+    application = FakeApplication(notifier)
+    monkeypatch.setattr(lambda_function, 'get_bot_instance', lambda: SimpleNamespace(admin_notifier=notifier))
+    
+    async def run():
+        for update_id in range(1, 6):
+            await lambda_function.process_update(application, SimpleNamespace(update_id=update_id))
+    asyncio.run(run())
+    
+    assert len(application.bot.sent) == 1
+    assert [(chat_id, message_id) for chat_id, message_id, _ in application.bot.edited] == [(1, 1)] * 4
+
+@pytest.fixture
+def bot(workdir, monkeypatch):
+    """An Application with /ok and /fail handlers wired into lambda_function"""
+    async def do_request(request, url, method, request_data=None, **kwargs):
+        # Only getMe is called, by initialize()
+        bot = {'id': 1000, 'is_bot': True, 'first_name': 'Bot', 'username': 'test_bot'}
+        return 200, json.dumps({'ok': True, 'result': bot}).encode()
+    monkeypatch.setattr(HTTPXRequest, 'do_request', do_request)
+    
+    handled = []
+    
+    async def ok(update, context):
+        handled.append(update.update_id)
+    
+    async def fail(update, context):
+        raise RuntimeError('handler failed')
+    
+    application = Application.builder().token('123456:test').build()
+    application.add_handler(CommandHandler('ok', ok))
+    application.add_handler(CommandHandler('fail', fail))
+    runtime = LambdaRuntime(application, reuse_loop=False)
+    instance = SimpleNamespace(application=application, admin_notifier=AdminNotifier(admin_ids=[1]))
+    dedupe = UpdateDedupeStore(path=str(workdir / 'processed_updates.json'))
+    monkeypatch.setattr(lambda_function, 'runtime', runtime)
+    monkeypatch.setattr(lambda_function, 'get_bot_instance', lambda: instance)
+    monkeypatch.setattr(lambda_function, 'update_dedupe', dedupe)
+    return SimpleNamespace(application=application, runtime=runtime, dedupe=dedupe, handled=handled)
+
+def test_a_failing_handler_fails_its_record_and_the_rest_of_its_user(bot):
+    updates = [('a', make_update(1, 10, '/fail')), ('b', make_update(2, 10, '/ok')), ('c', make_update(3, 20, '/ok'))]
+    records = [(message_id, Update.de_json(update, bot.application.bot)) for message_id, update in updates]
+    failures = bot.runtime.run(lambda_function.process_batch(bot.application, records))
+    
+    assert sorted(failures) == ['a', 'b']
+    assert bot.handled == [3]
+    # The failed update is not remembered as processed, so its redelivery runs
+    assert bot.dedupe.begin(1)
+    assert not bot.dedupe.begin(3)
+
+def test_a_failing_webhook_update_returns_500_and_is_processed_again(bot):
+    event = {'body': json.dumps(make_update(7, 10, '/fail'))}
+    assert lambda_function.lambda_handler(event, None)['statusCode'] == 500
+    assert bot.dedupe.begin(7)
+    bot.dedupe.release(7)
+    
+    event = {'body': json.dumps(make_update(8, 10, '/ok'))}
+    assert lambda_function.lambda_handler(event, None)['statusCode'] == 200
+    assert lambda_function.lambda_handler(event, None)['statusCode'] == 200
+    assert bot.handled == [8]
+
+def test_a_failed_database_flush_fails_the_whole_batch(bot, monkeypatch):
+    async def flush():
+        raise OSError('disk full')
+    monkeypatch.setattr(lambda_function, 'db', SimpleNamespace(flush=flush))
+    
+    event = {'Records': [
+        {'messageId': 'a', 'body': json.dumps(make_update(1, 10, '/ok'))},
+        {'messageId': 'b', 'body': json.dumps(make_update(2, 20, '/ok'))}
+    ]}
+    result = lambda_function.lambda_handler(event, None)
+    
+    assert sorted(item['itemIdentifier'] for item in result['batchItemFailures']) == ['a', 'b']
+    # Neither update is remembered as processed, so both redeliveries run
+    assert bot.dedupe.begin(1) and bot.dedupe.begin(2)
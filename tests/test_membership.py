@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from membership import MembershipCache, MembershipIndex, get_missing_channels
+
+class FakeBot:
+    """Answers get_chat_member from a set of (channel_id, user_id) members"""
+    
+    def __init__(self, members=()):
+        self.members = set(members)
+        self.calls = 0
+    
+    async def get_chat_member(self, channel_id, user_id):
+        self.calls += 1
+        return SimpleNamespace(status='member' if (channel_id, user_id) in self.members else 'left')
+
+def missing(bot, cache, index):
+    return asyncio.run(get_missing_channels(bot, 10, [-1, -2], cache=cache, index=index))
+
+def test_not_joined_is_rechecked_after_user_joins(workdir):
+    bot, cache, index = FakeBot(), MembershipCache(negative_ttl=0), MembershipIndex()
+    assert missing(bot, cache, index) == [-1, -2]
+    
+    bot.members = {(-1, 10), (-2, 10)}
+    assert missing(bot, cache, index) == []
+    assert bot.calls == 4
+
+def test_api_verdicts_are_not_written_to_index(workdir):
+    bot, index = FakeBot({(-1, 10)}), MembershipIndex()
+    missing(bot, None, index)
+    assert index.get(10, -1) is None and index.get(10, -2) is None
+
+def test_indexed_leave_is_rechecked_and_indexed_join_is_trusted(workdir):
+    bot, index = FakeBot({(-2, 10)}), MembershipIndex()
+    index.set(10, -1, True)
+    index.set(10, -2, False)
+    assert missing(bot, None, index) == []
+    # Only the channel indexed as left was asked about
+    assert bot.calls == 1
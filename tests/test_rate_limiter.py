@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from rate_limiter import PRIORITY_BULK, PRIORITY_HIGH, OutboundRateLimiter
+
+def test_retry_after_pauses_and_retries():
+    limiter = OutboundRateLimiter(max_retries=2)
+    calls = []
+    
+    async def send():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryAfter(0)
+        return 'sent'
+    
+    result = asyncio.run(limiter.process_request(send, (), {}, 'sendMessage', {'chat_id': 5}, None))
+    assert result == 'sent' and len(calls) == 2
+    assert limiter.stats()['retries'] == 1
+
+def test_retry_after_gives_up_after_max_retries():
+    limiter = OutboundRateLimiter(max_retries=1)
+    
+    async def send():
+        raise RetryAfter(0)
+    
+    with pytest.raises(RetryAfter):
+        asyncio.run(limiter.process_request(send, (), {}, 'sendMessage', {'chat_id': 5}, None))
+
+def test_higher_priority_is_sent_first_when_tokens_run_out():
+    limiter = OutboundRateLimiter(global_per_second=20)
+    order = []
+    
+    def request(label, chat_id, priority):
+        async def send():
+            order.append(label)
+        return limiter.process_request(send, (), {}, 'sendMessage', {'chat_id': chat_id}, {'priority': priority})
+    
+    async def run():
+        limiter.global_bucket.tokens = 0
+        # Queued first, but the bulk lane waits behind anything more urgent
+        bulk = [asyncio.create_task(request(f'bulk{i}', 100 + i, PRIORITY_BULK)) for i in range(3)]
+        await asyncio.sleep(0)
+        high = asyncio.create_task(request('high', 200, PRIORITY_HIGH))
+        await asyncio.gather(*bulk, high)
+    asyncio.run(run())
+    
+    assert order[0] == 'high'
+    assert order[1:] == ['bulk0', 'bulk1', 'bulk2']
+    assert limiter.stats()['sent'][PRIORITY_BULK] == 3
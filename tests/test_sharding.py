@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from database import Database, write_shards
+from snapshot import SnapshotFile
+from config import DATABASE_FILE, DATABASE_MAX_SHARDS, DATABASE_SHARD_FILE, DATABASE_SHARD_MANIFEST_FILE
+
+def reopen(db):
+    db.close()
+    return Database()
+
+def test_unsharded_database_is_migrated(workdir):
+    users = {
+        str(user_id): {'username': f'user{user_id}', 'first_name': 'Name', 'joined_at': '2024-01-01T00:00:00',
+                       'has_access': user_id % 2 == 0, 'last_check': None}
+        for user_id in range(1, 51)
+    }
+    with open(DATABASE_FILE, 'w') as f:
+        json.dump({'users': users, 'pending_links': [], 'approved_links': []}, f)
+    with open('bot_data.journal', 'w') as f:
+        f.write(json.dumps({'op': 'grant_access', 'user_id': '1', 'last_check': '2024-05-01T00:00:00', 'seq': 1}) + '\n')
+    
+    db = reopen(Database())
+    assert db.count_users() == 50
+    assert db.has_access(1) and db.has_access(2) and not db.has_access(3)
+    assert [user_id for batch in db.iter_user_ids() for user_id in batch] == list(range(1, 51))
+    db.close()
+
+def test_reshard_keeps_changes_made_while_running(workdir):
+    db = Database()
+    for user_id in range(100):
+        db.add_user(user_id, f'user{user_id}', 'Name')
+    
+    async def run():
+        async def writer():
+            for user_id in range(100, 150):
+                db.add_user(user_id, f'user{user_id}', 'Name')
+                await asyncio.sleep(0)
+        task = asyncio.create_task(writer())
+        assert await db.reshard(3)
+        await task
+        await db.flush()
+    asyncio.run(run())
+    
+    assert len(db.shards) == 3
+    db = reopen(db)
+    assert len(db.shards) == 3
+    assert db.count_users() == 150
+    assert db.get_user(149)['username'] == 'user149'
+    with open(DATABASE_SHARD_MANIFEST_FILE) as f:
+        assert json.load(f) == {'count': 3}
+    assert not any(name.endswith('-of-4.json') for name in os.listdir('.'))
+    db.close()
+
+def test_interrupted_reshard_files_are_removed_on_startup(workdir):
+    db = Database()
+    for user_id in range(20):
+        db.add_user(user_id, f'user{user_id}', 'Name')
+    db.close()
+    # A reshard to 3 that stopped before switching the manifest over
+    write_shards([shard.snapshot()['users'] for shard in db.shards], 3)
+    for index in range(3):
+        written = SnapshotFile(DATABASE_SHARD_FILE.format(index=index, count=3))
+        assert [entry[0] for entry in written.entries()] == list(range(index, 20, 3))
+        written.close()
+    
+    db = Database()
+    assert len(db.shards) == 4 and db.count_users() == 20
+    assert not any('-of-3.' in name for name in os.listdir('.'))
+    db.close()
+
+def test_overlapping_reshards_are_rejected(workdir):
+    db = Database()
+    for user_id in range(20):
+        db.add_user(user_id, f'user{user_id}', 'Name')
+    
+    async def run():
+        first = asyncio.create_task(db.reshard(3))
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await db.reshard(5)
+        assert await first
+    asyncio.run(run())
+    
+    db = reopen(db)
+    assert len(db.shards) == 3 and db.count_users() == 20
+    db.close()
+
+def test_reshard_count_is_capped(workdir):
+    db = Database()
+    for count in (0, DATABASE_MAX_SHARDS + 1):
+        with pytest.raises(ValueError):
+            asyncio.run(db.reshard(count))
+    assert not db.resharding
+    db.close()
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from database import Database
+from sqlite_database import SQLiteDatabase
+
+@pytest.fixture
+def sqlite_db(workdir):
+    db = SQLiteDatabase(str(workdir / 'bot_data.db'))
+    yield db
+    db.close()
+
+def test_users_and_access(sqlite_db):
+    sqlite_db.add_user(10, 'alice', 'Alice')
+    sqlite_db.add_user(11, 'bob', 'Bob')
+    assert sqlite_db.get_user(10)['username'] == 'alice'
+    assert sqlite_db.get_user(12) is None
+    assert not sqlite_db.has_access(10)
+    
+    sqlite_db.grant_access(10)
+    assert sqlite_db.has_access(10) and sqlite_db.get_user(10)['has_access'] is True
+    sqlite_db.revoke_access(10)
+    assert not sqlite_db.has_access(10)
+    
+    # Adding a user again updates their name but keeps the rest
+    sqlite_db.grant_access(11)
+    sqlite_db.add_user(11, 'bobby', 'Bob')
+    assert sqlite_db.get_user(11)['username'] == 'bobby' and sqlite_db.has_access(11)
+
+def test_blocked_users_are_skipped(sqlite_db):
+    for user_id in range(1, 8):
+        sqlite_db.add_user(user_id, f'user{user_id}', 'Name')
+    sqlite_db.mark_blocked(3)
+    assert sqlite_db.count_users() == 7
+    assert sqlite_db.count_users(include_blocked=False) == 6
+    assert list(sqlite_db.iter_user_ids(batch_size=4)) == [[1, 2, 4, 5], [6, 7]]
+    assert list(sqlite_db.iter_user_ids(after_id=5)) == [[6, 7]]
+    
+    # A blocked user who comes back is reachable again
+    sqlite_db.add_user(3, 'user3', 'Name')
+    assert sqlite_db.count_users(include_blocked=False) == 7
+
+def test_link_requests(sqlite_db):
+    first = sqlite_db.add_pending_link(10, 'alice', 'Private Channel Access', 'first')
+    second = sqlite_db.add_pending_link(11, 'bob', 'Private Channel Access', 'second')
+    third = sqlite_db.add_pending_link(10, 'alice', 'Private Channel Access', 'third')
+    assert sqlite_db.count_pending_links() == 3
+    
+    assert sqlite_db.approve_link(first, 1, 'https://t.me/+abc')
+    assert not sqlite_db.approve_link(first, 1, 'https://t.me/+def')
+    assert sqlite_db.reject_link(second, 1, 'no')
+    assert not sqlite_db.approve_link(second, 1, 'https://t.me/+def')
+    
+    assert sqlite_db.get_pending_link(first) is None
+    assert sqlite_db.get_link_request(first)['private_link'] == 'https://t.me/+abc'
+    assert sqlite_db.get_link_request(second)['status'] == 'rejected'
+    assert [req['id'] for req in sqlite_db.get_pending_links()] == [third]
+    assert [req['id'] for req in sqlite_db.get_user_link_requests(10)] == [first, third]
+
+def test_pending_pages(sqlite_db):
+    ids = [sqlite_db.add_pending_link(user_id, 'user', 'Private Channel Access', '') for user_id in range(25)]
+    page, has_prev, has_next = sqlite_db.get_pending_links_page(limit=10)
+    assert [req['id'] for req in page] == ids[:10] and not has_prev and has_next
+    page, has_prev, has_next = sqlite_db.get_pending_links_page(after_id=ids[19], limit=10)
+    assert [req['id'] for req in page] == ids[20:] and has_prev and not has_next
+    page, has_prev, has_next = sqlite_db.get_pending_links_page(before_id=ids[20], limit=10)
+    assert [req['id'] for req in page] == ids[10:20] and has_prev and has_next
+
+def test_migration_from_the_json_database(workdir):
+    db = Database()
+    for user_id in range(1, 11):
+        db.add_user(user_id, f'user{user_id}', 'Name')
+    db.grant_access(2)
+    db.mark_blocked(5)
+    approved = db.add_pending_link(2, 'user2', 'Private Channel Access', 'approve me')
+    rejected = db.add_pending_link(3, 'user3', 'Private Channel Access', 'reject me')
+    pending = db.add_pending_link(4, 'user4', 'Private Channel Access', 'waiting')
+    db.approve_link(approved, 1, 'https://t.me/+abc')
+    db.reject_link(rejected, 1)
+    asyncio.run(db.flush())
+    
+    sqlite_db = SQLiteDatabase(str(workdir / 'bot_data.db'))
+    assert sqlite_db.migrate_from_json(db.export()) == (10, 3)
+    
+    assert sqlite_db.get_user(2) == db.get_user(2)
+    assert sqlite_db.has_access(2) and not sqlite_db.has_access(3)
+    assert sqlite_db.count_users(include_blocked=False) == db.count_users(include_blocked=False) == 9
+    assert list(sqlite_db.iter_user_ids()) == list(db.iter_user_ids())
+    assert sqlite_db.get_pending_links() == db.get_pending_links()
+    assert sqlite_db.get_link_request(approved)['private_link'] == 'https://t.me/+abc'
+    assert sqlite_db.get_link_request(rejected)['status'] == 'rejected'
+    # New requests continue after the migrated ids
+    assert sqlite_db.add_pending_link(6, 'user6', 'Private Channel Access', 'new') == pending + 1
+    sqlite_db.close()
+    db.close()
@@ -0,0 +1,39 @@
+from update_dedupe import UpdateDedupeStore
+
+def test_failed_update_is_processed_after_a_later_one_succeeds(workdir):
+    store = UpdateDedupeStore(path='dedupe.json', size=10)
+    assert store.begin(100) and store.begin(101)
+    store.release(100)
+    store.done(101)
+    store.flush()
+    
+    restarted = UpdateDedupeStore(path='dedupe.json', size=10)
+    assert restarted.begin(100)
+    assert not restarted.begin(101)
+
+def test_duplicates_are_dropped(workdir):
+    store = UpdateDedupeStore(path='dedupe.json', size=10)
+    assert store.begin(5)
+    assert not store.begin(5)
+    store.done(5)
+    assert not store.begin(5)
+    assert store.stats()['dropped_duplicates'] == 2
+
+def test_eviction_never_drops_an_unprocessed_id(workdir):
+    store = UpdateDedupeStore(path='dedupe.json', size=3)
+    store.begin(100)
+    store.release(100)
+    for update_id in range(101, 110):
+        store.begin(update_id)
+        store.done(update_id)
+    assert store.begin(100)
+    assert not store.begin(109)
+
+def test_done_ids_are_written_on_flush(workdir):
+    store = UpdateDedupeStore(path='dedupe.json', size=10)
+    for update_id in range(1, 6):
+        store.begin(update_id)
+        store.done(update_id)
+    assert not (workdir / 'dedupe.json').exists()
+    store.flush()
+    assert not UpdateDedupeStore(path='dedupe.json', size=10).begin(3)
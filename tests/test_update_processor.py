@@ -0,0 +1,52 @@
+import asyncio
+
+from telegram import Update
+
+from update_processor import PerUserUpdateProcessor
+
+def make_update(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            'text': 'hello'
+        }
+    }, None)
+
+async def run(processor, updates, delay=0.01):
+    """Process updates the way the Application does, returns (user_id, update_id) in completion order and peak concurrency"""
+    finished = []
+    active = {'now': 0, 'peak': 0, 'users': set()}
+    
+    async def handle(update):
+        user_id = update.effective_user.id
+        assert user_id not in active['users'], 'two updates from one user ran at once'
+        active['users'].add(user_id)
+        active['now'] += 1
+        active['peak'] = max(active['peak'], active['now'])
+        await asyncio.sleep(delay)
+        active['now'] -= 1
+        active['users'].discard(user_id)
+        finished.append((user_id, update.update_id))
+    
+    await asyncio.gather(*(processor.process_update(update, handle(update)) for update in updates))
+    return finished, active['peak']
+
+def test_each_users_updates_run_in_order():
+    updates = [make_update(update_id, 10 + update_id % 3) for update_id in range(12)]
+    finished, _ = asyncio.run(run(PerUserUpdateProcessor(workers=4), updates))
+    for user_id in (10, 11, 12):
+        update_ids = [update_id for user, update_id in finished if user == user_id]
+        assert update_ids == sorted(update_ids) and len(update_ids) == 4
+
+def test_different_users_run_in_parallel_up_to_the_worker_count():
+    updates = [make_update(update_id, 100 + update_id) for update_id in range(10)]
+    processor = PerUserUpdateProcessor(workers=3)
+    _, peak = asyncio.run(run(processor, updates))
+    assert peak == 3
+    stats = processor.stats()
+    assert stats['processed'] == 10 and stats['active'] == 0 and stats['users_waiting'] == 0
+    assert not processor.locks
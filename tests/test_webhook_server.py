@@ -0,0 +1,59 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from webhook_server import WebhookServer
+
+SECRET = 'test-secret'
+
+def make_application():
+    return SimpleNamespace(running=True, bot=None, update_queue=asyncio.Queue(), update_processor=None)
+
+async def post(reader, writer, path, body, secret=SECRET, method='POST'):
+    """Send one request on a keep-alive connection, returns (status, payload)"""
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n"
+    if secret is not None:
+        head += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        headers[name.lower()] = value.strip()
+    return status, json.loads(await reader.readexactly(int(headers['content-length'])))
+
+def test_updates_are_queued_and_bad_requests_rejected():
+    update = json.dumps({'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'chat': {'id': 10, 'type': 'private'}, 'text': 'hi'
+    }}).encode()
+    
+    async def run():
+        application = make_application()
+        server = WebhookServer(application, listen='127.0.0.1', port=0, path='/webhook', secret_token=SECRET)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            # All on one keep-alive connection
+            assert (await post(reader, writer, '/webhook', update))[0] == 200
+            assert (await post(reader, writer, '/webhook', update, secret='wrong'))[0] == 403
+            assert (await post(reader, writer, '/webhook', update, secret=None))[0] == 403
+            assert (await post(reader, writer, '/webhook', b'{not json'))[0] == 400
+            assert (await post(reader, writer, '/other', update))[0] == 404
+            assert (await post(reader, writer, '/webhook', b'', method='GET'))[0] == 405
+            status, health = await post(reader, writer, '/health', b'', secret=None, method='GET')
+        finally:
+            writer.close()
+            await server.stop()
+        assert status == 200
+        assert health['received'] == 1 and health['rejected'] == 2 and health['invalid'] == 1
+        assert application.update_queue.qsize() == 1
+        assert (await application.update_queue.get()).update_id == 1
+    asyncio.run(run())
+
+def test_a_secret_token_is_required():
+    with pytest.raises(ValueError):
+        WebhookServer(make_application(), secret_token=None)
@@ -0,0 +1,99 @@
+import collections
+import json
+import logging
+import os
+
+from config import UPDATE_DEDUPE_FILE, UPDATE_DEDUPE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class UpdateDedupeStore:
+    """Remembers recently processed update_ids so redelivered updates are dropped"""
+    
+    # Telegram redelivers an update until the webhook answers 200, so a failed
+    # or slow invocation can see the same update_id again. Updates finish out
+    # of order (concurrent webhook requests, batches), so a high id being done
+    # says nothing about lower ones: the ids themselves are remembered. The
+    # last `size` processed ids are kept and written to disk by flush() so a
+    # restarted process still drops them; an id that has aged out is processed
+    # again rather than risk dropping one that never was.
+    
+    def __init__(self, path=UPDATE_DEDUPE_FILE, size=UPDATE_DEDUPE_SIZE):
+        self.path = path
+        self.size = size
+        self.recent = collections.deque()
+        self.seen = set()
+        self.in_flight = set()
+        self.high_water = -1
+        self.dropped_duplicates = 0
+        self.loaded = False
+        self.dirty = False
+    
+    def load(self):
+        """Read the persisted recent ids"""
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                # Older files only hold a high-water mark, which cannot be trusted
+                recent = json.load(f).get('recent', [])
+            for update_id in recent[-self.size:]:
+                self.recent.append(int(update_id))
+            self.seen = set(self.recent)
+            self.high_water = max(self.seen, default=-1)
+        except Exception as e:
+            logger.error(f"Error loading update dedupe state: {e}")
+    
+    def save(self):
+        """Write the recent ids to disk"""
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'recent': list(self.recent)}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving update dedupe state: {e}")
+    
+    def begin(self, update_id):
+        """Claim an update for processing, returns False if it is a duplicate"""
+        if not self.loaded:
+            self.load()
+        if update_id in self.seen or update_id in self.in_flight:
+            self.dropped_duplicates += 1
+            logger.info(f"Dropping duplicate update {update_id} ({self.dropped_duplicates} dropped so far)")
+            return False
+        self.in_flight.add(update_id)
+        return True
+    
+    def done(self, update_id):
+        """Record an update as processed"""
+        self.in_flight.discard(update_id)
+        self.seen.add(update_id)
+        self.recent.append(update_id)
+        while len(self.recent) > self.size:
+            self.seen.discard(self.recent.popleft())
+        self.high_water = max(self.high_water, update_id)
+        self.dirty = True
+    
+    def flush(self):
+        """Write the ids recorded since the last flush, once per invocation"""
+        if self.dirty:
+            self.dirty = False
+            self.save()
+    
+    def release(self, update_id):
+        """Give up a claim after processing failed, so a redelivery is processed again"""
+        self.in_flight.discard(update_id)
+    
+    def stats(self):
+        """Counters for logging"""
+        return {
+            'dropped_duplicates': self.dropped_duplicates,
+            'recent': len(self.recent),
+            'in_flight': len(self.in_flight),
+            'high_water': self.high_water
+        }
+
+# Global dedupe store, loaded on first use
+update_dedupe = UpdateDedupeStore()
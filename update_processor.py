@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from config import UPDATE_WORKERS, UPDATE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+def ordering_key(update):
+    """Updates with the same key are processed one at a time, in arrival order"""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return update.update_id
+    return id(update)
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different users in parallel and each user's updates in order"""
+    
+    # The Application starts a task per update in arrival order and
+    # BaseUpdateProcessor admits up to `max_pending` of them. Each task then
+    # queues on its user's lock (FIFO) before taking one of `workers` slots,
+    # so a user with a backlog waits without holding a slot another user
+    # could run in.
+    
+    def __init__(self, workers=UPDATE_WORKERS, max_pending=UPDATE_MAX_PENDING):
+        super().__init__(max_pending)
+        self.workers = workers
+        self.worker_slots = asyncio.Semaphore(workers)
+        self.locks = {}
+        self.backlog = {}
+        self.pending = 0
+        self.active = 0
+        self.processed = 0
+        self.max_depth = 0
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    async def do_process_update(self, update, coroutine):
+        key = ordering_key(update)
+        self.backlog[key] = self.backlog.get(key, 0) + 1
+        self.pending += 1
+        self.max_depth = max(self.max_depth, self.pending)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock, self.worker_slots:
+                self.active += 1
+                try:
+                    await coroutine
+                finally:
+                    self.active -= 1
+                    self.processed += 1
+        finally:
+            self.pending -= 1
+            self.backlog[key] -= 1
+            if not self.backlog[key]:
+                del self.backlog[key]
+                del self.locks[key]
+    
+    def stats(self):
+        """Queue depth metrics"""
+        return {
+            'workers': self.workers,
+            'active': self.active,
+            'waiting': self.pending - self.active,
+            'users_waiting': len(self.backlog),
+            'longest_user_backlog': max(self.backlog.values(), default=0),
+            'max_depth': self.max_depth,
+            'processed': self.processed
+        }
@@ -0,0 +1,54 @@
+import contextvars
+import json
+
+from config import WEBHOOK_REPLY_ENABLED
+
+# Set by the webhook entry points while an update is being processed
+current_reply = contextvars.ContextVar('current_reply', default=None)
+
+class WebhookReply:
+    """Holds at most one Bot API call to return as the webhook response"""
+    
+    # Telegram executes a method returned in the webhook response but never
+    # reports its result, so only final replies whose result is not needed
+    # should go through here.
+    
+    def __init__(self):
+        self.payload = None
+        self.token = None
+    
+    def __enter__(self):
+        if WEBHOOK_REPLY_ENABLED:
+            self.token = current_reply.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self.token is not None:
+            current_reply.reset(self.token)
+            self.token = None
+    
+    def response(self, body):
+        """Build the API Gateway response, carrying the captured call instead of body if there is one"""
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps(self.payload if self.payload is not None else body)
+        }
+
+async def reply_text(message, text, **kwargs):
+    """Reply to a message, inline in the webhook response when possible"""
+    reply = current_reply.get()
+    if reply is None or reply.payload is not None:
+        return await message.reply_text(text, **kwargs)
+    
+    payload = {'method': 'sendMessage', 'chat_id': message.chat_id, 'text': text}
+    if message.chat.type != 'private':
+        # Message.reply_text quotes the original outside private chats
+        payload['reply_to_message_id'] = message.message_id
+    for key, value in kwargs.items():
+        if value is not None:
+            payload[key] = value.to_dict() if hasattr(value, 'to_dict') else value
+    reply.payload = payload
+    return None
@@ -0,0 +1,163 @@
+import asyncio
+import hmac
+import json
+import logging
+import time
+from telegram import Update
+
+from config import (
+    WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_MAX_BODY_SIZE, WEBHOOK_IDLE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable'
+}
+
+class WebhookServer:
+    """Small HTTP/1.1 server that receives Telegram webhook POSTs and queues them on an Application"""
+    
+    # Updates are acknowledged as soon as they are queued; the Application
+    # processes them in the background, so a slow handler never makes
+    # Telegram time out and redeliver.
+    
+    def __init__(self, application, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 secret_token=WEBHOOK_SECRET_TOKEN):
+        if not secret_token:
+            # Without it anyone who can reach the port could post updates as any user, admins included
+            raise ValueError("WebhookServer needs a secret token")
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.server = None
+        self.started_at = time.monotonic()
+        self.received = 0
+        self.rejected = 0
+        self.invalid = 0
+    
+    async def start(self):
+        """Start listening"""
+        self.server = await asyncio.start_server(self.handle_connection, self.listen, self.port)
+        self.started_at = time.monotonic()
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.path}")
+    
+    async def stop(self):
+        """Stop accepting connections"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+    
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), WEBHOOK_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if body is None:
+                    status, payload = 413, {'error': 'Request body too large'}
+                    keep_alive = False
+                else:
+                    status, payload = await self.handle_request(method, path, headers, body)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except Exception as e:
+            logger.error(f"Error serving webhook connection: {e}")
+        finally:
+            writer.close()
+    
+    async def read_request(self, reader):
+        """Read one request, returns (method, path, headers, body) or None at end of stream"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        length = int(headers.get('content-length', 0))
+        if length > WEBHOOK_MAX_BODY_SIZE:
+            return method, target.split('?', 1)[0], headers, None
+        body = await reader.readexactly(length) if length else b''
+        return method, target.split('?', 1)[0], headers, body
+    
+    async def handle_request(self, method, path, headers, body):
+        """Route a request, returns (status, payload)"""
+        if path == '/health':
+            if method != 'GET':
+                return 405, {'error': 'Method not allowed'}
+            return (200 if self.application.running else 503), self.health()
+        
+        if path != self.path:
+            return 404, {'error': 'Not found'}
+        if method != 'POST':
+            return 405, {'error': 'Method not allowed'}
+        
+        if not hmac.compare_digest(
+                headers.get('x-telegram-bot-api-secret-token', '').encode('latin-1'), self.secret_token.encode()):
+            self.rejected += 1
+            logger.warning("Rejected webhook request with a wrong secret token")
+            return 403, {'error': 'Invalid secret token'}
+        
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            self.invalid += 1
+            logger.error(f"Invalid webhook update: {e}")
+            return 400, {'error': 'Invalid update'}
+        
+        if update:
+            self.received += 1
+            await self.application.update_queue.put(update)
+        return 200, {'status': 'ok'}
+    
+    async def write_response(self, writer, status, payload, keep_alive):
+        """Write a JSON response"""
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    def health(self):
+        """Liveness details for load balancer health checks"""
+        health = {
+            'status': 'ok' if self.application.running else 'stopped',
+            'uptime': round(time.monotonic() - self.started_at),
+            'received': self.received,
+            'rejected': self.rejected,
+            'invalid': self.invalid,
+            'queued': self.application.update_queue.qsize()
+        }
+        if hasattr(self.application.update_processor, 'stats'):
+            health['processing'] = self.application.update_processor.stats()
+        return health